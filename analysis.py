@@ -1,27 +1,41 @@
+"""抽卡概率的理论计算与实验验证
+
+NumPy/SciPy以及依赖它们的模块都在用到的方法里才导入：
+只做基础理论计算（十连分布、保底前概率）时不加载任何数值计算库。
+"""
 import math
+from array import array
 import random
 from typing import List, Tuple
-import numpy as np
-from scipy import stats
-from scipy.special import binom  # 添加这一行
-from gacha import GachaSystem, ItemType, ItemRarity
+from gacha import BannerRates, DEFAULT_RATES, GachaSystem, ItemType, ItemRarity, pool_id_array
+from result_cache import ResultCache, default_cache
 
 class GachaAnalysis:
-    def __init__(self):
-        self.base_five_star_prob = 0.006
-        self.base_four_star_prob = 0.051
-        self.step_up = 73
-        self.step_end = 90
+    def __init__(self, rates: BannerRates = DEFAULT_RATES, cache: ResultCache = None):
+        # 与GachaSystem共用同一份概率表
+        self.rates = rates
+        # 理论结果缓存，按卡池参数和查询参数区分
+        self.cache = cache if cache is not None else default_cache()
+
+    @property
+    def base_five_star_prob(self):
+        return self.rates.base_five_star_prob
+
+    @property
+    def base_four_star_prob(self):
+        return self.rates.base_four_star_prob
+
+    @property
+    def step_up(self):
+        return self.rates.step_up
+
+    @property
+    def step_end(self):
+        return self.rates.step_end
 
     def _calc_single_prob(self, pull_count: int) -> float:
         """计算单抽概率"""
-        if pull_count < self.step_up:
-            return self.base_five_star_prob
-        elif pull_count >= self.step_end:
-            return 1.0
-        else:
-            progress = (pull_count - self.step_up) / (self.step_end - self.step_up)
-            return self.base_five_star_prob + (1 - self.base_five_star_prob) * progress
+        return self.rates.five_star_prob(pull_count)
 
     def calculate_multi_pull_probs_theory(self) -> dict:
         """理论计算十连抽的概率分布（不考虑概率提升）"""
@@ -32,10 +46,10 @@ class GachaAnalysis:
         p_none = q ** 10
         
         # 一个五星概率：选择1个位置是五星，其他都不是
-        p_one = binom(10, 1) * p * (q ** 9)
+        p_one = math.comb(10, 1) * p * (q ** 9)
         
         # 两个五星概率：选择2个位置是五星，其他都不是
-        p_two = binom(10, 2) * (p ** 2) * (q ** 8)
+        p_two = math.comb(10, 2) * (p ** 2) * (q ** 8)
         
         # 三个及以上五星概率
         p_more = 1 - p_none - p_one - p_two
@@ -49,17 +63,7 @@ class GachaAnalysis:
 
     def _calculate_pity_sequence(self, total_pulls: int) -> List[float]:
         """计算考虑保底的概率序列"""
-        probs = []
-        for i in range(1, total_pulls + 1):
-            if i < self.step_up:
-                probs.append(self.base_five_star_prob)
-            elif i >= self.step_end:
-                probs.append(1.0)
-            else:
-                progress = (i - self.step_up) / (self.step_end - self.step_up)
-                prob = self.base_five_star_prob + (1 - self.base_five_star_prob) * progress
-                probs.append(prob)
-        return probs
+        return [self.rates.five_star_prob(i) for i in range(1, total_pulls + 1)]
 
     def prob_before_pity(self) -> dict:
         """计算在概率提升前出金的概率"""
@@ -76,111 +80,83 @@ class GachaAnalysis:
             "到达概率提升": prob_not_get
         }
 
-    def limited_prob_for_pulls(self, max_pulls: int = 170) -> dict:
+    def limited_prob_for_pulls(self, max_pulls: int = 170, copies: int = 1) -> dict:
         """计算不同抽数获得限定五星的概率（考虑多金）"""
-        results = {}
-        for pulls in range(10, max_pulls + 1, 10):
-            # 使用动态规划计算概率
-            prob = self._calculate_limited_dp(pulls)
-            results[pulls] = prob
-        return results
+        curve = self.limited_prob_curve(max_pulls, copies)
+        return {pulls: float(curve[pulls]) for pulls in range(10, max_pulls + 1, 10)}
+
+    def _limited_transition_matrices(self) -> Tuple['np.ndarray', 'np.ndarray']:
+        """单抽转移矩阵 (A, B)，按卡池参数缓存，见markov.limited_transition_matrices"""
+        from markov import limited_transition_matrices
+        return limited_transition_matrices(self.rates)
+
+    def limited_prob_curve(self, max_pulls: int, copies: int = 1) -> 'np.ndarray':
+        """返回每个抽数（0..max_pulls）下至少获得copies个限定的概率（只读）
+
+        每个copies只计算并缓存一条曲线，推进到硬保底上限2·copies·step_end为止，
+        之后概率恒为1；不同的max_pulls都从这条曲线截取或补齐。
+        """
+        import numpy as np
+        curve = self.cache.get_or_compute(
+            self.rates, 'limited_prob_curve', (copies,),
+            lambda: {'curve': self._compute_limited_prob_curve(2 * copies * self.step_end, copies)})['curve']
+        if max_pulls < len(curve):
+            return curve[:max_pulls + 1]
+        curve = np.concatenate((curve, np.full(max_pulls + 1 - len(curve), curve[-1])))
+        curve.flags.writeable = False
+        return curve
+
+    def _compute_limited_prob_curve(self, max_pulls: int, copies: int) -> 'np.ndarray':
+        """只保留当前一层状态（已获得的限定数 × 保底状态），内存与抽数无关"""
+        import numpy as np
+        A, B = self._limited_transition_matrices()
+        state = np.zeros((copies, 2 * self.step_end))
+        state[0, 0] = 1.0  # 初始状态：0个限定，小保底，0抽距离
+        finish = B.sum(axis=1)
+
+        curve = np.zeros(max_pulls + 1)
+        done = 0.0
+        for i in range(1, max_pulls + 1):
+            done += state[-1] @ finish
+            gained = state @ B
+            state = state @ A
+            state[1:] += gained[:-1]
+            curve[i] = done
+        return curve
 
     def _calculate_limited_dp(self, total_pulls: int) -> float:
-        """使用动态规划计算获得限定的概率"""
-        # dp[i][j][k][l] 表示：
-        # i: 当前抽数
-        # j: 获得的限定数量
-        # k: 当前是否在大保底(0:小保底, 1:大保底)
-        # l: 距离上次五星的抽数(0-89)
-        dp = [[[[0.0 for _ in range(90)] for _ in range(2)] 
-               for _ in range(total_pulls + 1)] for _ in range(total_pulls + 1)]
-        
-        # 初始状态：0抽，0个限定，小保底，0抽距离
-        dp[0][0][0][0] = 1.0
-        
-        for i in range(total_pulls):
-            for j in range(i + 1):
-                for k in range(2):
-                    for l in range(90):
-                        if dp[i][j][k][l] == 0:
-                            continue
-                            
-                        # 计算当前抽的五星概率
-                        current_prob = self._calc_single_prob(l + 1)
-                        
-                        # 没抽到五星：距离+1
-                        if l + 1 < 90:  # 除非到达90抽保底
-                            dp[i+1][j][k][l+1] += dp[i][j][k][l] * (1 - current_prob)
-                        
-                        # 抽到五星：距离重置为0
-                        if k == 0:  # 小保底
-                            # 抽到限定：限定数+1，保持小保底
-                            dp[i+1][j+1][0][0] += dp[i][j][k][l] * current_prob * 0.5
-                            # 抽到常驻：进入大保底
-                            dp[i+1][j][1][0] += dp[i][j][k][l] * current_prob * 0.5
-                        else:  # 大保底
-                            # 必定是限定：限定数+1，回到小保底
-                            dp[i+1][j+1][0][0] += dp[i][j][k][l] * current_prob
-        
-        # 统计所有抽到至少一个限定的概率
-        total_prob = 0
-        for j in range(1, total_pulls + 1):
-            for k in range(2):
-                for l in range(90):
-                    total_prob += dp[total_pulls][j][k][l]
-        
-        return total_prob
+        """计算total_pulls抽内获得限定的概率"""
+        return float(self.limited_prob_curve(total_pulls)[total_pulls])
+
+    def limited_pulls_distribution(self, copies: int = 1) -> 'PullsDistribution':
+        """获得copies个限定五星所需抽数的完整分布"""
+        from distribution import PullsDistribution
+        payload = self.cache.get_or_compute(
+            self.rates, 'limited_pulls_distribution', (copies,),
+            lambda: {'pmf': PullsDistribution.for_limited(self.rates.five_star_array[1:], copies,
+                                                          self.rates.limited_five_star_prob).pmf})
+        return PullsDistribution(payload['pmf'])
+
+    def pulls_for_probability(self, prob: float, copies: int = 1) -> int:
+        """以prob的把握获得copies个限定所需的抽数，例如 (0.9, 7) 表示九成把握满命"""
+        return self.limited_pulls_distribution(copies).quantile(prob)
 
     def expected_pulls_theory(self) -> float:
         """理论计算期望抽数（考虑保底）"""
-        # 计算单个五星的期望抽数（不考虑大小保底）
-        exp_before_pity = 0
-        prob_not_get = 1
-        for i in range(1, self.step_up):
-            prob_get = prob_not_get * self.base_five_star_prob
-            exp_before_pity += i * prob_get
-            prob_not_get *= (1 - self.base_five_star_prob)
-        
-        exp_during_pity = 0
-        for i in range(self.step_up, self.step_end + 1):
-            current_prob = self._calc_single_prob(i)
-            prob_get = prob_not_get * current_prob
-            exp_during_pity += i * prob_get
-            prob_not_get *= (1 - current_prob)
-        
-        single_five_star_exp = exp_before_pity + exp_during_pity
-        
-        # 计算获得限定五星的期望
-        # 情况1：直接抽中限定（概率0.5）
-        p_direct = 0.5
-        exp_direct = single_five_star_exp
-        
-        # 情况2：先歪再保底（概率0.5）
-        p_guaranteed = 0.5
-        exp_guaranteed = single_five_star_exp * 2  # 需要抽两次五星
-        
-        # 总期望 = 各种情况的期望之和
-        total_exp = p_direct * exp_direct + p_guaranteed * exp_guaranteed
-        
-        return total_exp
+        return self.limited_pulls_distribution().mean()
 
     def prob_distribution_by_pulls(self) -> dict:
         """计算不同抽数获得限定五星的理论概率"""
-        results = {}
-        for pulls in range(10, 171, 10):
-            prob = self._calculate_limited_dp(pulls)  # 直接使用动态规划方法
-            results[pulls] = prob
-        return results
-    
-    # 删除 _calculate_limited_prob_theory 函数，因为它的功能已经被 _calculate_limited_dp 完全替代
+        return self.limited_prob_for_pulls(170)
 
-    def experimental_verification(self, num_trials: int = 1000000) -> dict:
-        """使用实际抽卡系统进行实验验证"""
-        gacha = GachaSystem()
+    def experimental_verification(self, num_trials: int = 1000000, seed: int = None) -> dict:
+        """使用实际抽卡系统进行实验验证，给定seed时结果可复现"""
+        from random_source import BufferedRandomSource
+        gacha = GachaSystem(BufferedRandomSource(seed), self.rates)
         results = {
             'total_pulls': 0,
             'five_star_count': 0,
-            'five_star_positions': [],  # 记录每个五星出现的位置
+            'five_star_positions': array('q'),  # 记录每个五星出现的位置
             'four_star_count': 0,
             'limited_five_star_count': 0
         }
@@ -199,121 +175,92 @@ class GachaAnalysis:
         
         return results
 
+    def population_verification(self, num_players: int = 1000000, seed: int = None) -> dict:
+        """模拟大量独立玩家，得到首次获得限定所需抽数的分布"""
+        import numpy as np
+        from population import PlayerPopulation
+        population = PlayerPopulation(num_players, np.random.default_rng(seed), self.rates)
+        population.run_until_first_limited(2 * self.step_end)
+        summary = population.summary()
+        summary['theory_mean'] = self.expected_pulls_theory()
+        return summary
+
+    def compare_batch_and_scalar(self, num_trials: int = 1000000, seed: int = None) -> dict:
+        """验证批量抽卡引擎与逐抽模拟同分布（卡方检验）"""
+        import numpy as np
+        from scipy import stats
+        scalar = GachaSystem(random.Random(seed), self.rates)
+        scalar_rarity = np.empty(num_trials, dtype=np.int8)
+        scalar_limited = np.empty(num_trials, dtype=bool)
+        for i in range(num_trials):
+            result = scalar.pull()
+            scalar_rarity[i] = result.rarity.value
+            scalar_limited[i] = result.item_type == ItemType.LIMITED
+
+        batch = GachaSystem(np.random.default_rng(seed), self.rates).pull_batch(num_trials)
+        batch_limited = batch.item_type == 1
+
+        def categories(rarity, limited):
+            # 0三星 1常驻四星 2限定四星 3常驻五星 4限定五星
+            return np.bincount(pool_id_array(rarity, limited), minlength=5)
+
+        def five_star_gaps(rarity):
+            positions = np.flatnonzero(rarity == 5) + 1
+            return np.bincount(np.diff(positions, prepend=0), minlength=self.step_end + 1)[1:]
+
+        outcome_table = np.array([categories(scalar_rarity, scalar_limited),
+                                  categories(batch.rarity, batch_limited)])
+        gap_table = np.array([five_star_gaps(scalar_rarity), five_star_gaps(batch.rarity)])
+        gap_table = gap_table[:, gap_table.sum(axis=0) > 0]
+
+        return {
+            '逐抽五星率': np.mean(scalar_rarity == 5),
+            '批量五星率': np.mean(batch.rarity == 5),
+            '逐抽四星率': np.mean(scalar_rarity == 4),
+            '批量四星率': np.mean(batch.rarity == 4),
+            '结果分布p值': stats.chi2_contingency(outcome_table)[1],
+            '出金间隔p值': stats.chi2_contingency(gap_table)[1]
+        }
+
+    def pity_chain(self) -> 'JointPityChain':
+        """(五星保底, 四星保底, 大小保底) 的联合马尔可夫链，按卡池参数缓存"""
+        from markov import pity_chain_for
+        return pity_chain_for(self.rates)
+
+    def count_distributions(self, pulls: int) -> dict:
+        """从初始状态抽pulls次，五星/限定五星/四星/限定四星数量的精确分布（结果有缓存，只读）"""
+        return self.cache.get_or_compute(self.rates, 'count_distributions', (pulls,),
+                                         lambda: self.pity_chain().count_distributions(pulls))
+
     def calculate_theoretical_rates(self) -> dict:
-        """计算考虑保底机制的理论概率"""
-        # dp[i][j] 表示 (距离上次五星i抽，保底状态j) 的概率分布
-        # j=0表示小保底，j=1表示大保底
-        dp = [[0.0 for _ in range(2)] for _ in range(90)]
-        dp[0][0] = 1.0  # 初始状态：小保底
-        
-        epsilon = 1e-10
-        max_iter = 10000
-        old_dp = [row[:] for row in dp]
-        
-        for _ in range(max_iter):
-            new_dp = [[0.0 for _ in range(2)] for _ in range(90)]
-            
-            for i in range(90):
-                current_prob = self._calc_single_prob(i + 1)
-                for j in range(2):  # j是保底状态
-                    if dp[i][j] == 0:
-                        continue
-                        
-                    if i == 89:  # 89抽必定出金
-                        if j == 0:  # 小保底
-                            # 出限定，回到小保底
-                            new_dp[0][0] += dp[i][j] * 0.5
-                            # 出常驻，进入大保底
-                            new_dp[0][1] += dp[i][j] * 0.5
-                        else:  # 大保底
-                            # 必定出限定，回到小保底
-                            new_dp[0][0] += dp[i][j]
-                    else:
-                        # 不出金，距离+1，保底状态不变
-                        new_dp[i + 1][j] += dp[i][j] * (1 - current_prob)
-                        
-                        if j == 0:  # 小保底
-                            # 出限定，回到小保底
-                            new_dp[0][0] += dp[i][j] * current_prob * 0.5
-                            # 出常驻，进入大保底
-                            new_dp[0][1] += dp[i][j] * current_prob * 0.5
-                        else:  # 大保底
-                            # 必定出限定，回到小保底
-                            new_dp[0][0] += dp[i][j] * current_prob
-            
-            # 归一化
-            total = sum(sum(row) for row in new_dp)
-            if total > 0:
-                new_dp = [[p / total for p in row] for row in new_dp]
-            
-            # 检查收敛
-            if all(abs(a - b) < epsilon 
-                  for row1, row2 in zip(new_dp, old_dp) 
-                  for a, b in zip(row1, row2)):
-                dp = new_dp
-                break
-                
-            old_dp = [row[:] for row in new_dp]
-            dp = new_dp
-        
-        # 计算五星和限定五星的真实概率
-        total_five_star_rate = 0
-        limited_five_star_rate = 0
-        
-        for i in range(90):
-            current_prob = self._calc_single_prob(i + 1)
-            # 小保底时的贡献
-            total_five_star_rate += dp[i][0] * current_prob
-            limited_five_star_rate += dp[i][0] * current_prob * 0.5
-            # 大保底时的贡献
-            total_five_star_rate += dp[i][1] * current_prob
-            limited_five_star_rate += dp[i][1] * current_prob  # 大保底必定是限定
-        
-        # 计算四星的真实概率（代码不变）
-        real_four_star_rate = 0
-        four_star_dp = [0.0] * 10  # 四星保底的状态分布
-        four_star_dp[0] = 1.0
-        
-        # 计算四星的稳态分布
-        old_four_dp = four_star_dp.copy()
-        for _ in range(max_iter):
-            new_four_dp = [0.0] * 10
-            
-            for i in range(10):
-                if i == 9:  # 第9抽（第10次抽卡）
-                    new_four_dp[0] += four_star_dp[i]  # 必定四星
-                else:
-                    # 考虑五星挤压的四星概率
-                    effective_four_rate = max(min(1 - total_five_star_rate, self.base_four_star_prob), 0)
-                    # 没出四星
-                    new_four_dp[i + 1] += four_star_dp[i] * (1 - effective_four_rate)
-                    # 出四星
-                    new_four_dp[0] += four_star_dp[i] * effective_four_rate
-            
-            # 归一化
-            total = sum(new_four_dp)
-            if total > 0:
-                new_four_dp = [p / total for p in new_four_dp]
-            
-            # 检查收敛
-            if all(abs(a - b) < epsilon for a, b in zip(new_four_dp, old_four_dp)):
-                four_star_dp = new_four_dp
+        """计算考虑保底机制的理论概率（联合马尔可夫链的精确稳态）"""
+        payload = self.cache.get_or_compute(self.rates, 'theoretical_rates', (), lambda: self.pity_chain().rates())
+        return {name: float(value) for name, value in payload.items()}
+
+    def converge_verification(self, tolerance: float = 0.002, max_trials: int = 100000000,
+                              chunk_size: int = 1000000, seed: int = None) -> dict:
+        """分块批量模拟，所有概率都收敛到理论值的tolerance以内时提前停止"""
+        import numpy as np
+        from online_stats import RateAccumulator
+        theory = self.calculate_theoretical_rates()
+        gacha = GachaSystem(np.random.default_rng(seed), self.rates)
+        accumulator = RateAccumulator(self.step_end)
+        while accumulator.total_pulls < max_trials:
+            accumulator.update_batch(gacha.pull_batch(min(chunk_size, max_trials - accumulator.total_pulls)))
+            if accumulator.converged(theory, tolerance):
                 break
-                
-            old_four_dp = new_four_dp
-            four_star_dp = new_four_dp
-        
-        # 计算四星的真实概率
-        real_four_star_rate = sum(four_star_dp[i] * (1 if i == 9 else 
-            max(min(1 - total_five_star_rate, self.base_four_star_prob), 0)) 
-            for i in range(10))
-        
         return {
-            'five_star_rate': total_five_star_rate,
-            'four_star_rate': real_four_star_rate,
-            'limited_rate': limited_five_star_rate
+            'converged': accumulator.converged(theory, tolerance),
+            'accumulator': accumulator,
+            'comparison': self.compare_theory_and_practice(accumulator.results()),
+            'confidence_intervals': accumulator.confidence_intervals()
         }
 
+    def compare_history(self, path) -> dict:
+        """对磁盘上的抽卡记录做流式统计，再与理论值比较"""
+        from history import PullHistory
+        return self.compare_theory_and_practice(PullHistory(path).statistics())
+
     def compare_theory_and_practice(self, experimental_data: dict) -> dict:
         """比较理论值和实验值"""
         total_pulls = experimental_data['total_pulls']
@@ -339,6 +286,7 @@ class GachaAnalysis:
         }
 
 if __name__ == "__main__":
+    import numpy as np
     analyzer = GachaAnalysis()
     
     print("\n=== 理论概率分析 ===")
@@ -356,6 +304,10 @@ if __name__ == "__main__":
     for pulls, prob in prob_dist.items():
         print(f"{pulls}抽: {prob:.2%}")
     
+    print("\n180抽内各类结果数量的期望（精确分布）：")
+    for name, pmf in analyzer.count_distributions(180).items():
+        print(f"{name}: {np.arange(len(pmf)) @ pmf:.3f}")
+    
     print("\n=== 实验验证 ===")
     experimental_data = analyzer.experimental_verification(5000000)
     comparison = analyzer.compare_theory_and_practice(experimental_data)
@@ -363,3 +315,19 @@ if __name__ == "__main__":
     print("\n理论与实验对比：")
     for metric, value in comparison.items():
         print(f"{metric}: {value:.4%}")
+
+    print("\n=== 收敛验证（批量引擎，误差0.2%以内即停止）===")
+    convergence = analyzer.converge_verification(0.002)
+    print(f"{'已收敛' if convergence['converged'] else '未收敛'}，共模拟{convergence['accumulator'].total_pulls}抽")
+    for metric, (low, high) in convergence['confidence_intervals'].items():
+        print(f"{metric} 95%置信区间: [{low:.4%}, {high:.4%}]")
+
+    print("\n=== 玩家群体模拟 ===")
+    population = analyzer.population_verification(1000000)
+    print(f"首次获得限定的平均抽数: {population['first_limited_mean']:.2f}（理论 {population['theory_mean']:.2f}）")
+    for q, pulls in population['first_limited_quantiles'].items():
+        print(f"{q:.0%}玩家在{pulls:.0f}抽内获得限定")
+
+    print("\n=== 批量引擎验证 ===")
+    for metric, value in analyzer.compare_batch_and_scalar(1000000).items():
+        print(f"{metric}: {value:.4f}")
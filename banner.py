@@ -0,0 +1,91 @@
+"""声明式卡池配置
+
+配置文件为JSON，所有字段均可省略（取默认值）：
+{
+    "name": "character",
+    "base_five_star_prob": 0.006,      五星基础概率
+    "base_four_star_prob": 0.051,      四星基础概率
+    "step_up": 73,                     从第几抽开始概率提升
+    "step_end": 90,                    第几抽必出五星
+    "four_star_pity": 10,              四星保底抽数
+    "limited_five_star_prob": 0.5,     小保底时出限定五星的概率
+    "limited_four_star_prob": 0.5,     四星中限定四星的概率
+    "items": {...}                     物品池，格式同items.json；也可用 "items_file" 指定文件
+}
+同一份配置（按内容哈希）只编译一次，之后创建模拟器或分析器都直接复用编译好的模型。
+"""
+import hashlib
+import json
+from dataclasses import dataclass
+from functools import cached_property
+from pathlib import Path
+from gacha import BannerRates, GachaSystem, POOL_KEYS, RATE_FIELDS, compile_pools, load_item_config
+
+
+_compiled = {}
+
+
+@dataclass(frozen=True)
+class BannerModel:
+    """编译后的卡池：概率表、转移矩阵、物品池，均不可变"""
+    name: str
+    digest: str
+    rates: BannerRates
+    pools: tuple
+
+    @property
+    def items(self) -> dict:
+        return {key: list(pool.names) for key, pool in zip(POOL_KEYS, self.pools)}
+
+    @cached_property
+    def pity_chain(self):
+        from markov import pity_chain_for
+        return pity_chain_for(self.rates)
+
+    @cached_property
+    def limited_transitions(self):
+        from markov import limited_transition_matrices
+        return limited_transition_matrices(self.rates)
+
+    def simulator(self, rng=None) -> GachaSystem:
+        return GachaSystem(rng, self.rates, self.pools)
+
+    def analysis(self):
+        from analysis import GachaAnalysis
+        return GachaAnalysis(self.rates)
+
+
+def _resolve(config: dict, base_dir: Path) -> dict:
+    """补全物品池并规范化，作为哈希的输入"""
+    unknown = set(config) - set(RATE_FIELDS) - {'name', 'items', 'items_file'}
+    if unknown:
+        raise ValueError(f"未知的卡池配置字段: {', '.join(sorted(unknown))}")
+    resolved = {key: config[key] for key in RATE_FIELDS if key in config}
+    resolved['name'] = config.get('name', 'default')
+    if 'items' in config:
+        resolved['items'] = config['items']
+    else:
+        items_file = config.get('items_file')
+        resolved['items'] = load_item_config(base_dir / items_file if items_file else None)
+    return resolved
+
+
+def compile_banner(config: dict, base_dir=None) -> BannerModel:
+    """编译卡池配置；内容相同的配置返回同一个BannerModel"""
+    resolved = _resolve(config, Path(base_dir or '.'))
+    digest = hashlib.sha256(json.dumps(resolved, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+    model = _compiled.get(digest)
+    if model is None:
+        rates = BannerRates(**{key: resolved[key] for key in RATE_FIELDS if key in resolved})
+        model = BannerModel(resolved['name'], digest, rates, compile_pools(resolved['items']))
+        _compiled[digest] = model
+    return model
+
+
+def load_banner(path=None) -> BannerModel:
+    """从JSON文件加载卡池；不给路径时为默认的角色卡池"""
+    if path is None:
+        return compile_banner({})
+    path = Path(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        return compile_banner(json.load(f), path.parent)
@@ -0,0 +1,168 @@
+"""抽卡模拟与理论分析热点路径的基准测试
+
+    python bench/run.py -o before.json                   运行全部基准，结果写入JSON
+    python bench/run.py -k pull -o after.json            只运行名称包含pull的基准
+    python bench/run.py --compare before.json after.json --threshold 0.1
+                                                         比较两次结果，变慢超过10%时返回非0
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+from analysis import GachaAnalysis
+from gacha import DEFAULT_RATES, GachaSystem
+from markov import JointPityChain
+from result_cache import ResultCache
+
+BENCHMARKS = {}
+
+
+def benchmark(name: str, unit: str):
+    """注册基准：被装饰的函数返回 (准备好的可调用对象, 每次调用完成的工作量)"""
+    def register(setup):
+        BENCHMARKS[name] = (setup, unit)
+        return setup
+    return register
+
+
+@benchmark('pull', 'pulls/s')
+def bench_pull():
+    gacha = GachaSystem(0)
+    n = 200000
+
+    def run():
+        for _ in range(n):
+            gacha.pull()
+    return run, n
+
+
+@benchmark('pull_multi', 'pulls/s')
+def bench_pull_multi():
+    gacha = GachaSystem(0)
+    n = 20000
+
+    def run():
+        for _ in range(n):
+            gacha.pull_multi(10)
+    return run, n * 10
+
+
+@benchmark('pull_batch', 'pulls/s')
+def bench_pull_batch():
+    gacha = GachaSystem(np.random.default_rng(0))
+    n = 5000000
+    return (lambda: gacha.pull_batch(n)), n
+
+
+def _bench_dp(horizon: int):
+    # 不使用缓存，测量DP本身
+    analyzer = GachaAnalysis(cache=ResultCache())
+    return (lambda: analyzer._compute_limited_prob_curve(horizon, 1)), horizon
+
+
+for _horizon in (170, 1000, 5000):
+    benchmark(f'limited_dp_{_horizon}', 'pulls/s')(lambda horizon=_horizon: _bench_dp(horizon))
+
+
+@benchmark('count_dp_2000', 'pulls/s')
+def bench_count_dp():
+    chain = JointPityChain(DEFAULT_RATES)
+    return (lambda: chain.count_distributions(2000)), 2000
+
+
+@benchmark('stationary_solver', 'solves/s')
+def bench_stationary():
+    return (lambda: JointPityChain(DEFAULT_RATES).rates()), 1
+
+
+def measure(setup, repeat: int) -> dict:
+    run, work = setup()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    # 单独再跑一次测峰值内存，tracemalloc会拖慢计时
+    run, _ = setup()
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    best = min(times)
+    return {'seconds': best, 'throughput': work / best, 'peak_bytes': peak}
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def run_all(pattern: str = '', repeat: int = 3) -> dict:
+    results = {}
+    for name, (setup, unit) in BENCHMARKS.items():
+        if pattern not in name:
+            continue
+        result = measure(setup, repeat)
+        result['unit'] = unit
+        results[name] = result
+        print(f"{name:<20} {result['throughput']:>14,.1f} {unit:<10} "
+              f"{result['seconds'] * 1000:>10.2f} ms  峰值内存 {result['peak_bytes'] / 1024 / 1024:.1f} MiB")
+    return {
+        'meta': {
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S')
+        },
+        'results': results
+    }
+
+
+def compare(old: dict, new: dict, threshold: float) -> bool:
+    """逐项比较耗时，返回是否没有超过阈值的退化"""
+    ok = True
+    for name, new_result in new['results'].items():
+        old_result = old['results'].get(name)
+        if old_result is None:
+            continue
+        ratio = new_result['seconds'] / old_result['seconds']
+        regressed = ratio > 1 + threshold
+        ok = ok and not regressed
+        print(f"{name:<20} {old_result['seconds'] * 1000:>10.2f} ms -> {new_result['seconds'] * 1000:>10.2f} ms "
+              f"({ratio - 1:+.1%}){'  退化' if regressed else ''}")
+    return ok
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-k', '--filter', default='', help='只运行名称包含该字符串的基准')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='每个基准重复次数，取最快一次')
+    parser.add_argument('-o', '--output', help='结果JSON的输出路径')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='比较两个结果JSON')
+    parser.add_argument('--threshold', type=float, default=0.1, help='允许的变慢比例')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        old, new = (json.loads(Path(path).read_text(encoding='utf-8')) for path in args.compare)
+        return 0 if compare(old, new, args.threshold) else 1
+
+    report = run_all(args.filter, args.repeat)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding='utf-8')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""入口模块的冷启动导入时间（基于 python -X importtime）
+
+    python bench/startup.py                      检查全部入口，超出预算或加载了NumPy/SciPy时返回非0
+    python bench/startup.py --budget 40 -o startup.json
+
+每个入口在新的解释器进程中导入，取多次中最快的一次累计导入时间。
+"""
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# 这些入口只做逐抽模拟或基础理论计算，不应加载数值计算库
+ENTRY_POINTS = ('gacha', 'tui', 'analysis', 'banner', 'result_cache', 'cli')
+HEAVY_MODULES = ('numpy', 'scipy')
+
+
+def import_profile(module: str) -> dict:
+    """在新进程中导入module，返回累计导入时间（微秒）和加载的顶层包"""
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=ROOT, capture_output=True, text=True, check=True).stderr
+    cumulative = None
+    packages = set()
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        # 格式: "import time: 自身耗时 | 累计耗时 | 缩进表示嵌套层级的模块名"
+        _, cumulative_us, name = line[len('import time:'):].split('|')
+        name = name.rstrip()[1:]
+        packages.add(name.strip().split('.')[0])
+        if name == module:
+            cumulative = int(cumulative_us)
+    return {'microseconds': cumulative, 'packages': packages}
+
+
+def measure(module: str, repeat: int) -> dict:
+    profiles = [import_profile(module) for _ in range(repeat)]
+    return {
+        'milliseconds': min(p['microseconds'] for p in profiles) / 1000,
+        'heavy': sorted(set(HEAVY_MODULES) & profiles[0]['packages'])
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-k', '--filter', default='', help='只检查名称包含该字符串的入口')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='每个入口重复次数，取最快一次')
+    parser.add_argument('--budget', type=float, default=80.0, help='每个入口允许的累计导入时间（毫秒）')
+    parser.add_argument('-o', '--output', help='结果JSON的输出路径')
+    args = parser.parse_args(argv)
+
+    ok = True
+    results = {}
+    for module in ENTRY_POINTS:
+        if args.filter not in module:
+            continue
+        result = measure(module, args.repeat)
+        over = result['milliseconds'] > args.budget
+        ok = ok and not over and not result['heavy']
+        results[module] = result
+        print(f"{module:<14} {result['milliseconds']:>8.1f} ms"
+              f"{'  超出预算' if over else ''}"
+              f"{'  加载了 ' + ', '.join(result['heavy']) if result['heavy'] else ''}")
+    if args.output:
+        Path(args.output).write_text(json.dumps({'budget_ms': args.budget, 'results': results}, indent=2),
+                                     encoding='utf-8')
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
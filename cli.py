@@ -0,0 +1,270 @@
+"""无界面的命令行入口，输出机器可读的结果
+
+    python cli.py simulate -n 100000000 --seed 0 --workers 4 --format csv -o run.csv
+    python cli.py simulate -n 10000000 --format columnar -o run_dir      逐抽原始结果按列写入目录
+    python cli.py theory --banner banners/weapon.json --copies 2
+    python cli.py compare -n 50000000 --tolerance 0.002                  与理论值比较，超出误差时返回非0
+
+模拟使用批量引擎（GachaSystem.pull_batch），按分片分给多个进程；分片划分与随机数流只由
+--seed和--shard-size决定，与--workers无关。每个分片完成后立即输出一行结果，进度和吞吐写到stderr。
+输出格式：
+    json      JSON Lines：每个分片一行 {"type": "chunk", ...}，最后一行 {"type": "summary", ...}
+    csv       每个分片一行，最后一行chunk为total；compare另外输出chunk为theory和relative_error的两行
+    columnar  -o指定的目录下 rarity.bin / item_type.bin / item_index.bin / pity.bin 按列追加原始结果，
+              meta.json记录各列dtype、行数和汇总；可用numpy.memmap直接读取
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+# 原始结果各列的文件名与dtype，同history.RECORD_DTYPE
+COLUMNS = (('rarity', 'i1'), ('item_type', 'i1'), ('item_index', '<i4'), ('pity', '<i2'))
+CHUNK_FIELDS = ('chunk', 'pulls', 'five_star_count', 'four_star_count', 'limited_five_star_count',
+                'five_star_rate', 'four_star_rate', 'limited_rate')
+
+
+def _simulate_shard(args):
+    """在子进程中模拟一个分片，返回 (统计, 原始列或None)"""
+    import numpy as np
+    from gacha import GachaSystem
+    from online_stats import RateAccumulator
+    seed_seq, num_trials, rates, pools, raw = args
+    batch = GachaSystem(np.random.default_rng(seed_seq), rates, pools).pull_batch(num_trials)
+    accumulator = RateAccumulator(rates.step_end).update_batch(batch)
+    columns = tuple(getattr(batch, name) for name, _ in COLUMNS) if raw else None
+    return accumulator, columns
+
+
+def simulate_chunks(banner, num_trials: int, seed: int = 0, workers: int = 1, shard_size: int = None, raw: bool = False):
+    """按分片顺序逐个产出 (统计, 原始列或None)"""
+    import numpy as np
+    from parallel import DEFAULT_SHARD_SIZE, shard_sizes
+    sizes = shard_sizes(num_trials, shard_size or DEFAULT_SHARD_SIZE)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(s, n, banner.rates, banner.pools, raw) for s, n in zip(seeds, sizes)]
+    if workers == 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield _simulate_shard(task)
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            yield from executor.map(_simulate_shard, tasks)
+
+
+def _chunk_row(index, accumulator) -> dict:
+    row = {'chunk': index, 'pulls': accumulator.total_pulls}
+    row.update(accumulator.results())
+    del row['total_pulls']
+    row.update(accumulator.rates())
+    return row
+
+
+class ResultWriter:
+    """逐行写出分片结果；columnar格式同时按列追加原始结果"""
+
+    def __init__(self, fmt: str, output=None):
+        self.fmt = fmt
+        self.directory = None
+        if fmt == 'columnar':
+            if not output:
+                raise SystemExit("columnar格式需要用-o指定输出目录")
+            self.directory = Path(output)
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self.columns = [open(self.directory / f"{name}.bin", 'wb') for name, _ in COLUMNS]
+            self.stream = sys.stdout
+        else:
+            self.stream = open(output, 'w', encoding='utf-8', newline='') if output else sys.stdout
+        self.csv = csv.DictWriter(self.stream, CHUNK_FIELDS, extrasaction='ignore') if fmt == 'csv' else None
+        if self.csv:
+            self.csv.writeheader()
+
+    def chunk(self, row: dict, columns=None):
+        if self.fmt == 'json':
+            self.stream.write(json.dumps({'type': 'chunk', **row}) + '\n')
+        elif self.fmt == 'csv':
+            self.csv.writerow(row)
+        else:
+            for f, column in zip(self.columns, columns):
+                f.write(column.tobytes())
+                f.flush()
+        self.stream.flush()
+
+    def summary(self, summary: dict):
+        if self.fmt == 'csv':
+            self.csv.writerow({'chunk': 'total', 'pulls': summary['total_pulls'], **summary['counts'], **summary['rates']})
+            for key in ('theory', 'relative_error'):
+                if key in summary:
+                    self.csv.writerow({'chunk': key, **summary[key]})
+        else:
+            if self.directory is not None:
+                meta = {'rows': summary['total_pulls'],
+                        'columns': {name: {'file': f"{name}.bin", 'dtype': dtype} for name, dtype in COLUMNS},
+                        'summary': summary}
+                (self.directory / 'meta.json').write_text(json.dumps(meta, indent=2, ensure_ascii=False), encoding='utf-8')
+            self.stream.write(json.dumps({'type': 'summary', **summary}, ensure_ascii=False) + '\n')
+        self.stream.flush()
+
+    def close(self):
+        if self.directory is not None:
+            for f in self.columns:
+                f.close()
+        elif self.stream is not sys.stdout:
+            self.stream.close()
+
+
+class Progress:
+    """进度与吞吐写到stderr；stderr不是终端时每次输出一行"""
+
+    def __init__(self, total: int, quiet: bool = False):
+        self.total = total
+        self.quiet = quiet
+        self.done = 0
+        self.start = time.perf_counter()
+        self.end = '\r' if sys.stderr.isatty() else '\n'
+
+    def update(self, pulls: int):
+        self.done += pulls
+        if not self.quiet:
+            print(f"[{self.done / self.total:6.1%}] {self.done:,}/{self.total:,} 抽  "
+                  f"{self.throughput() / 1e6:.2f}M 抽/秒", end=self.end, file=sys.stderr, flush=True)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def throughput(self) -> float:
+        return self.done / max(self.elapsed(), 1e-9)
+
+    def finish(self):
+        if not self.quiet and self.end == '\r':
+            print(file=sys.stderr)
+
+
+def run_simulation(args, banner, writer: ResultWriter):
+    from online_stats import RateAccumulator
+    total = RateAccumulator(banner.rates.step_end)
+    progress = Progress(args.trials, args.quiet)
+    chunks = simulate_chunks(banner, args.trials, args.seed, args.workers, args.shard_size,
+                             raw=args.format == 'columnar')
+    for index, (accumulator, columns) in enumerate(chunks):
+        total.merge(accumulator)
+        writer.chunk(_chunk_row(index, accumulator), columns)
+        progress.update(accumulator.total_pulls)
+    progress.finish()
+    summary = {
+        'banner': banner.name,
+        'engine': 'pull_batch',
+        'seed': args.seed,
+        'workers': args.workers,
+        'total_pulls': total.total_pulls,
+        'counts': {key: value for key, value in total.results().items() if key != 'total_pulls'},
+        'rates': total.rates(),
+        'confidence_intervals': {key: list(interval) for key, interval in total.confidence_intervals().items()},
+        'mean_five_star_gap': total.gap_mean,
+        'elapsed_seconds': progress.elapsed(),
+        'pulls_per_second': progress.throughput()
+    }
+    return summary
+
+
+def cmd_simulate(args, banner) -> int:
+    writer = ResultWriter(args.format, args.output)
+    try:
+        writer.summary(run_simulation(args, banner, writer))
+    finally:
+        writer.close()
+    return 0
+
+
+def cmd_compare(args, banner) -> int:
+    writer = ResultWriter(args.format, args.output)
+    try:
+        summary = run_simulation(args, banner, writer)
+        theory = banner.analysis().calculate_theoretical_rates()
+        summary['theory'] = theory
+        summary['relative_error'] = {key: abs(summary['rates'][key] - value) / value for key, value in theory.items()}
+        writer.summary(summary)
+    finally:
+        writer.close()
+    if args.tolerance is not None and max(summary['relative_error'].values()) > args.tolerance:
+        return 1
+    return 0
+
+
+def cmd_theory(args, banner) -> int:
+    analyzer = banner.analysis()
+    curve = analyzer.limited_prob_curve(args.max_pulls, args.copies)
+    stream = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+    try:
+        if args.format == 'csv':
+            # CSV只输出概率曲线：pulls抽以内获得copies个限定的概率
+            writer = csv.writer(stream)
+            writer.writerow(('pulls', 'probability'))
+            writer.writerows((pulls, float(curve[pulls])) for pulls in range(1, args.max_pulls + 1))
+        else:
+            distribution = analyzer.limited_pulls_distribution(args.copies)
+            result = {
+                'banner': banner.name,
+                'params': banner.rates.params(),
+                'rates': analyzer.calculate_theoretical_rates(),
+                'copies': args.copies,
+                'expected_pulls': float(distribution.mean()),
+                'quantiles': {str(q): int(distribution.quantile(q)) for q in (0.1, 0.25, 0.5, 0.75, 0.9, 0.99)},
+                'curve': [float(p) for p in curve[1:]]
+            }
+            stream.write(json.dumps(result, ensure_ascii=False) + '\n')
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+    return 0
+
+
+def positive_int(text: str) -> int:
+    """argparse的type：不是正整数时报告用法错误"""
+    value = int(text)
+    if value <= 0:
+        raise argparse.ArgumentTypeError(f"需要正整数: {text}")
+    return value
+
+
+def build_parser() -> argparse.ArgumentParser:
+    # 各子命令共用的选项，写在子命令之后
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--banner', help='卡池配置JSON，缺省为默认角色卡池')
+    common.add_argument('-o', '--output', help='输出文件（columnar格式为目录），缺省写到stdout')
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    for name, help_text in (('simulate', '批量模拟'), ('compare', '批量模拟并与理论值比较')):
+        sub = subparsers.add_parser(name, help=help_text, parents=[common])
+        sub.add_argument('-n', '--trials', type=positive_int, default=10_000_000, help='总抽数')
+        sub.add_argument('--seed', type=int, default=0)
+        sub.add_argument('--workers', type=positive_int, default=os.cpu_count() or 1, help='进程数')
+        sub.add_argument('--shard-size', type=positive_int, help='每个分片的抽数')
+        sub.add_argument('--format', choices=('json', 'csv', 'columnar'), default='json')
+        sub.add_argument('-q', '--quiet', action='store_true', help='不输出进度')
+        if name == 'compare':
+            sub.add_argument('--tolerance', type=float, help='相对误差超过该值时返回非0')
+
+    sub = subparsers.add_parser('theory', help='理论值', parents=[common])
+    sub.add_argument('--copies', type=positive_int, default=1, help='目标限定五星数量')
+    sub.add_argument('--max-pulls', type=positive_int, default=180, help='概率曲线的最大抽数')
+    sub.add_argument('--format', choices=('json', 'csv'), default='json')
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    # 数值计算相关的模块在解析完参数后才导入，--help不需要加载NumPy
+    from banner import load_banner
+    banner = load_banner(args.banner)
+    commands = {'simulate': cmd_simulate, 'compare': cmd_compare, 'theory': cmd_theory}
+    return commands[args.command](args, banner)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,56 @@
+import numpy as np
+
+# 卷积次数超过此值时改用FFT
+FFT_THRESHOLD = 8
+
+
+def hitting_pmf(five_star_probs) -> np.ndarray:
+    """从保底0出发，恰好第j抽出五星的概率，下标为抽数（下标0为0）"""
+    p = np.asarray(five_star_probs, dtype=float)
+    survival = np.concatenate(([1.0], np.cumprod(1 - p)[:-1]))
+    return np.concatenate(([0.0], p * survival))
+
+
+def convolve_power(pmf: np.ndarray, k: int) -> np.ndarray:
+    """pmf的k重卷积：k个独立同分布抽数之和的分布"""
+    if k == 0:
+        return np.array([1.0])
+    if k <= FFT_THRESHOLD:
+        result = pmf
+        for _ in range(k - 1):
+            result = np.convolve(result, pmf)
+        return result
+    size = (len(pmf) - 1) * k + 1
+    fft_size = 1 << (size - 1).bit_length()
+    result = np.fft.irfft(np.fft.rfft(pmf, fft_size) ** k, fft_size)[:size]
+    # 去掉FFT带来的微小负值和舍入误差
+    result = np.clip(result, 0, None)
+    return result / result.sum()
+
+
+class PullsDistribution:
+    """获得k个限定五星所需抽数的完整分布，均值、CDF、分位数都由同一个数组得到"""
+
+    def __init__(self, pmf: np.ndarray):
+        self.pmf = pmf
+        self.cdf = np.cumsum(pmf)
+
+    @classmethod
+    def for_limited(cls, five_star_probs, copies: int = 1, win_prob: float = 0.5):
+        hit = hitting_pmf(five_star_probs)
+        # 从小保底出发拿到一个限定：直接中（一次五星）或先歪再大保底（两次五星）
+        one = (1 - win_prob) * np.convolve(hit, hit)
+        one[:len(hit)] += win_prob * hit
+        # 每拿到一个限定都回到小保底、保底0，各份之间独立同分布
+        return cls(convolve_power(one, copies))
+
+    def mean(self) -> float:
+        return float(np.arange(len(self.pmf)) @ self.pmf)
+
+    def prob_within(self, pulls: int) -> float:
+        """pulls抽以内达成的概率"""
+        return float(self.cdf[min(pulls, len(self.cdf) - 1)])
+
+    def quantile(self, prob: float) -> int:
+        """以至少prob的概率达成所需的最少抽数"""
+        return int(min(np.searchsorted(self.cdf, prob - 1e-12), len(self.cdf) - 1))
@@ -1,8 +1,12 @@
-import random
 import json
-from dataclasses import dataclass
+import struct
+from dataclasses import dataclass, field, fields
 from enum import Enum
+from functools import cached_property, lru_cache
 from pathlib import Path
+from item_pool import ItemPool
+from pull_log import PullLog
+from random_source import make_random_source
 
 class ItemRarity(Enum):
     THREE_STAR = 3
@@ -19,76 +23,310 @@ class GachaResult:
     item_type: ItemType
     item_name: str
 
+@dataclass(frozen=True)
+class BannerRates:
+    """由卡池参数一次性算出的保底概率表，抽卡和理论分析共用同一份
+
+    下标均为计数器自增之后的值（即"这是距离上次五星/四星的第几抽"）：
+        five_star[pity5]              五星概率，pity5取0~step_end
+        probabilities[pity5][pity4]   (三星, 四星, 五星)概率，pity4超过four_star_pity时按four_star_pity取
+    """
+    base_five_star_prob: float = 0.006
+    base_four_star_prob: float = 0.051
+    step_up: int = 73
+    step_end: int = 90
+    four_star_pity: int = 10
+    limited_five_star_prob: float = 0.5  # 小保底时出限定五星的概率（50/50）
+    limited_four_star_prob: float = 0.5  # 出四星时为限定四星的概率
+    five_star: tuple = field(init=False, repr=False, compare=False)
+    probabilities: tuple = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        five_star = []
+        for pity in range(self.step_end + 1):
+            if pity < self.step_up:
+                five_star.append(self.base_five_star_prob)
+            elif pity >= self.step_end:
+                five_star.append(1.0)
+            else:
+                progress = (pity - self.step_up) / (self.step_end - self.step_up)
+                five_star.append(self.base_five_star_prob + (1 - self.base_five_star_prob) * progress)
+
+        probabilities = []
+        for p5 in five_star:
+            row = []
+            for pity4 in range(self.four_star_pity + 1):
+                if pity4 >= self.four_star_pity:
+                    p4 = 1 - p5  # 四星保底：不是五星就必定是四星
+                else:
+                    p4 = max(min(1 - p5, self.base_four_star_prob), 0)  # 四星概率会被五星挤压
+                row.append((max(1 - p5 - p4, 0), p4, p5))
+            probabilities.append(tuple(row))
+
+        object.__setattr__(self, 'five_star', tuple(five_star))
+        object.__setattr__(self, 'probabilities', tuple(probabilities))
+
+    # NumPy版本的概率表只在批量计算第一次用到时构建，逐抽路径不需要导入NumPy
+    @cached_property
+    def five_star_array(self) -> 'np.ndarray':
+        import numpy as np
+        array = np.array(self.five_star)
+        array.flags.writeable = False
+        return array
+
+    @cached_property
+    def four_star_array(self) -> 'np.ndarray':
+        """four_star_array[pity5, pity4]为四星概率"""
+        import numpy as np
+        array = np.array([[p4 for _, p4, _ in row] for row in self.probabilities])
+        array.flags.writeable = False
+        return array
+
+    def five_star_prob(self, pity: int) -> float:
+        return self.five_star[min(pity, self.step_end)]
+
+    def adjusted_probabilities(self, pity5: int, pity4: int) -> tuple:
+        return self.probabilities[min(pity5, self.step_end)][min(pity4, self.four_star_pity)]
+
+    def params(self) -> dict:
+        """卡池参数（不含由参数算出的概率表），可直接序列化为JSON"""
+        return {name: getattr(self, name) for name in RATE_FIELDS}
+
+# 卡池参数名，即BannerRates的构造参数
+RATE_FIELDS = tuple(f.name for f in fields(BannerRates) if f.init)
+
+DEFAULT_RATES = BannerRates()
+
+# 批量抽卡结果中物品类型的紧凑编码
+TYPE_STANDARD = 0
+TYPE_LIMITED = 1
+
+# 物品池键名，下标即批量结果中使用的池编号
+POOL_KEYS = ['three_star', 'four_star', 'limited_four_star', 'five_star', 'limited_five_star']
+
+_RARITIES = {rarity.value: rarity for rarity in ItemRarity}
+
+def _pool_id(rarity: int, type_code: int) -> int:
+    if rarity == 5:
+        return 3 + type_code
+    if rarity == 4:
+        return 1 + type_code
+    return 0
+
+def pool_id_array(rarity, item_type) -> 'np.ndarray':
+    """_pool_id的向量化版本，数组形状任意"""
+    import numpy as np
+    item_type = np.asarray(item_type, dtype=np.int8)
+    return np.where(rarity == 5, 3 + item_type, np.where(rarity == 4, 1 + item_type, 0)).astype(np.int8)
+
+def sample_pool_indices(pools, pool_ids, u) -> 'np.ndarray':
+    """按池编号分组，每个池用别名表一次抽出所有物品下标；u为与pool_ids同形状的均匀随机数"""
+    import numpy as np
+    item_index = np.zeros(np.shape(pool_ids), dtype=np.int32)
+    for pool_id, pool in enumerate(pools):
+        mask = pool_ids == pool_id
+        item_index[mask] = pool.sample_indices(u[mask])
+    return item_index
+
+@dataclass
+class BatchResult:
+    """批量抽卡结果，按列存储而不是逐个构造GachaResult"""
+    rarity: 'np.ndarray'      # int8，取值3/4/5
+    item_type: 'np.ndarray'   # int8，TYPE_STANDARD/TYPE_LIMITED
+    item_index: 'np.ndarray'  # int32，物品在对应池中的下标
+    pity: 'np.ndarray'        # int16，出货时距离上次五星的抽数
+
+    def __len__(self):
+        return len(self.rarity)
+
+    def to_results(self, items: dict) -> list:
+        """展开为GachaResult列表（仅用于少量结果的展示）"""
+        results = []
+        for rarity, type_code, index in zip(self.rarity.tolist(), self.item_type.tolist(), self.item_index.tolist()):
+            pool = items[POOL_KEYS[_pool_id(rarity, type_code)]]
+            item_type = ItemType.LIMITED if type_code == TYPE_LIMITED else ItemType.STANDARD
+            results.append(GachaResult(_RARITIES[rarity], item_type, pool[index]))
+        return results
+
+def load_item_config(items_path=None) -> dict:
+    """读取物品池配置，默认为本目录下的items.json"""
+    try:
+        items_path = items_path or Path(__file__).parent / 'items.json'
+        with open(items_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        # 如果文件不存在或解析失败，使用默认物品名称
+        return {
+            'limited_five_star': [f"限定五星角色"],
+            'five_star': [f"常驻五星角色_{i+1}" for i in range(3)],
+            'limited_four_star': [f"限定四星角色_{i+1}" for i in range(2)],
+            'four_star': [f"常驻四星角色_{i+1}" for i in range(4)],
+            'three_star': [f"三星物品_{i+1}" for i in range(3)]
+        }
+
+def compile_pools(config: dict) -> tuple:
+    return tuple(ItemPool.from_config(config[key]) for key in POOL_KEYS)
+
+@lru_cache(maxsize=None)
+def load_pools(items_path=None) -> tuple:
+    """同一个物品文件只读取、编译一次，所有GachaSystem共用"""
+    return compile_pools(load_item_config(items_path))
+
+@lru_cache(maxsize=None)
+def _item_names(pools: tuple) -> dict:
+    # 名称表也在实例间共用，不要修改
+    return {key: list(pool.names) for key, pool in zip(POOL_KEYS, pools)}
+
+# 打包格式各字段的上限
+PACKED_FIVE_STAR_MAX = 0x7f
+PACKED_FOUR_STAR_MAX = 0xf
+
+def check_packable(rates: BannerRates):
+    """卡池的保底状态能否用PityState打包保存，不能时抛ValueError
+
+    五星计数最大为step_end-1（第step_end抽必出五星）；四星计数按15饱和，要求四星保底不超过15。
+    """
+    if rates.step_end - 1 > PACKED_FIVE_STAR_MAX:
+        raise ValueError(f"step_end={rates.step_end}超出保底状态打包格式的上限{PACKED_FIVE_STAR_MAX + 1}")
+    if rates.four_star_pity > PACKED_FOUR_STAR_MAX:
+        raise ValueError(f"four_star_pity={rates.four_star_pity}超出保底状态打包格式的上限{PACKED_FOUR_STAR_MAX}")
+
+class PityState:
+    """一个玩家的保底状态，可打包成2字节
+
+    打包格式（uint16）：低7位 距离上次五星，中间4位 距离上次四星，第11位 上次五星是否限定。
+    距离上次四星超过15时按15保存：计数达到四星保底后再增加不影响结果（见check_packable）。
+    距离上次五星超过127时打包抛ValueError。
+    """
+    __slots__ = ('since_last_five_star', 'since_last_four_star', 'last_limited_five_star')
+
+    def __init__(self, since_last_five_star: int = 0, since_last_four_star: int = 0, last_limited_five_star: int = 1):
+        self.since_last_five_star = since_last_five_star
+        self.since_last_four_star = since_last_four_star
+        self.last_limited_five_star = last_limited_five_star
+
+    def __eq__(self, other):
+        return isinstance(other, PityState) and self.pack() == other.pack()
+
+    def __repr__(self):
+        return (f"PityState({self.since_last_five_star}, {self.since_last_four_star}, "
+                f"{self.last_limited_five_star})")
+
+    def pack(self) -> int:
+        if not 0 <= self.since_last_five_star <= PACKED_FIVE_STAR_MAX or self.since_last_four_star < 0:
+            raise ValueError(f"{self!r}超出打包格式的范围")
+        return (self.since_last_five_star
+                | min(self.since_last_four_star, PACKED_FOUR_STAR_MAX) << 7
+                | (1 if self.last_limited_five_star else 0) << 11)
+
+    @classmethod
+    def unpack(cls, packed: int) -> 'PityState':
+        return cls(packed & 0x7f, packed >> 7 & 0xf, packed >> 11 & 1)
+
+    def to_bytes(self) -> bytes:
+        return struct.pack('<H', self.pack())
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'PityState':
+        return cls.unpack(struct.unpack('<H', data)[0])
+
+def encode_states(since_last_five_star, since_last_four_star, last_limited_five_star) -> 'np.ndarray':
+    """批量打包保底状态，格式同PityState.pack；超出范围时抛ValueError"""
+    import numpy as np
+    since_last_five_star = np.asarray(since_last_five_star)
+    since_last_four_star = np.asarray(since_last_four_star)
+    if since_last_five_star.size and (since_last_five_star.min() < 0 or since_last_five_star.max() > PACKED_FIVE_STAR_MAX):
+        raise ValueError("距离上次五星超出打包格式的范围")
+    if since_last_four_star.size and since_last_four_star.min() < 0:
+        raise ValueError("距离上次四星超出打包格式的范围")
+    return (since_last_five_star.astype(np.uint16)
+            | np.minimum(since_last_four_star, PACKED_FOUR_STAR_MAX).astype(np.uint16) << 7
+            | np.asarray(last_limited_five_star, dtype=np.uint16) << 11)
+
+def decode_states(packed) -> tuple:
+    """批量解包，返回 (距离上次五星, 距离上次四星, 上次五星是否限定) 三个数组"""
+    import numpy as np
+    packed = np.asarray(packed, dtype=np.uint16)
+    return packed & 0x7f, packed >> 7 & 0xf, (packed >> 11 & 1).astype(bool)
+
+INITIAL_STATE = PityState().pack()
+
+# pull_batch超过这么多抽时分块计算，限制中间数组的内存
+BATCH_CHUNK = 1 << 18
+
 class GachaSystem:
-    def __init__(self):
+    def __init__(self, rng=None, rates: BannerRates = DEFAULT_RATES, pools=None):
+        # 随机数源：种子、random.Random、numpy Generator或random_source中的随机数源
+        self.rng = make_random_source(rng)
+        self.rates = rates
+
         self.since_last_five_star = 0
         self.since_last_four_star = 0
         self.last_limited_five_star = 1
         
-        self.base_five_star_prob = 0.006
-        self.base_four_star_prob = 0.051
-        self.step_up = 73
-        self.step_end = 90
-        
-        # 加载物品池
-        self.load_items()
-    
-    def load_items(self):
-        try:
-            items_path = Path(__file__).parent / 'items.json'
-            with open(items_path, 'r', encoding='utf-8') as f:
-                self.items = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            # 如果文件不存在或解析失败，使用默认物品名称
-            self.items = {
-                'limited_five_star': [f"限定五星角色"],
-                'five_star': [f"常驻五星角色_{i+1}" for i in range(3)],
-                'limited_four_star': [f"限定四星角色_{i+1}" for i in range(2)],
-                'four_star': [f"常驻四星角色_{i+1}" for i in range(4)],
-                'three_star': [f"三星物品_{i+1}" for i in range(3)]
-            }
-
-    def _get_random_item(self, rarity: ItemRarity, item_type: ItemType) -> str:
-        if rarity == ItemRarity.FIVE_STAR:
-            pool = self.items['limited_five_star' if item_type == ItemType.LIMITED else 'five_star']
-        elif rarity == ItemRarity.FOUR_STAR:
-            pool = self.items['limited_four_star' if item_type == ItemType.LIMITED else 'four_star']
+        # 加载物品池（可直接传入已编译的物品池），编译结果在实例间共用
+        if pools is None:
+            self.load_items()
         else:
-            pool = self.items['three_star']
-        return random.choice(pool)
+            self.pools = tuple(pools)
+            self.items = _item_names(self.pools)
+
+    @classmethod
+    def from_state(cls, state: PityState, rng=None, rates: BannerRates = DEFAULT_RATES, pools=None):
+        """为保存过的玩家创建模拟器，不涉及文件读取"""
+        gacha = cls(rng, rates, pools)
+        gacha.restore(state)
+        return gacha
+
+    def snapshot(self) -> PityState:
+        return PityState(self.since_last_five_star, self.since_last_four_star, self.last_limited_five_star)
+
+    def restore(self, state: PityState):
+        self.since_last_five_star = state.since_last_five_star
+        self.since_last_four_star = state.since_last_four_star
+        self.last_limited_five_star = state.last_limited_five_star
+    
+    def load_items(self, items_path=None):
+        # 编译成按池编号索引的别名表，items只保留名称列表
+        self.pools = load_pools(items_path)
+        self.items = _item_names(self.pools)
+
+    def item_name(self, rarity: int, type_code: int, item_index: int) -> str:
+        """由整数编码查出物品名称"""
+        return self.pools[_pool_id(rarity, type_code)].names[item_index]
+
+    @property
+    def base_five_star_prob(self):
+        return self.rates.base_five_star_prob
+
+    @property
+    def base_four_star_prob(self):
+        return self.rates.base_four_star_prob
+
+    @property
+    def step_up(self):
+        return self.rates.step_up
+
+    @property
+    def step_end(self):
+        return self.rates.step_end
 
     def _calculate_five_star_prob(self):
-        if self.since_last_five_star < self.step_up:
-            return self.base_five_star_prob
-        
-        if self.since_last_five_star >= self.step_end:
-            return 1.0
-            
-        progress = (self.since_last_five_star - self.step_up) / (self.step_end - self.step_up)
-        return self.base_five_star_prob + (1 - self.base_five_star_prob) * progress
+        return self.rates.five_star_prob(self.since_last_five_star)
 
     def _get_adjusted_probabilities(self):
-        p5 = self._calculate_five_star_prob()
-        
-        # 先判断是否到达四星保底
-        if self.since_last_four_star >= 10:
-            p4 = 1 - p5  # 如果不是五星就必定是四星
-        else:
-            # 正常情况下四星概率会被五星挤压
-            p4 = max(min(1 - p5, self.base_four_star_prob), 0)
-        
-        # 三星概率为剩余概率
-        p3 = max(1 - p5 - p4, 0)
-        return p3, p4, p5
+        return self.rates.adjusted_probabilities(self.since_last_five_star, self.since_last_four_star)
 
-    def pull(self) -> GachaResult:
+    def _pull_codes(self) -> tuple:
+        """单抽的核心逻辑，返回整数编码 (稀有度, 类型, 池编号, 物品下标, 出货时的五星计数)"""
         # 先更新计数器，再进行概率判断
         self.since_last_five_star += 1
         self.since_last_four_star += 1
+        pity = self.since_last_five_star
         
         p3, p4, p5 = self._get_adjusted_probabilities()
         
-        rand = random.random()
+        rand = self.rng.random()
         if rand < p5:
             # 抽中五星，重置五星计数器
             self.since_last_five_star = 0
@@ -96,32 +334,157 @@ class GachaSystem:
             if self.last_limited_five_star == 0:
                 # 大保底，必定限定
                 self.last_limited_five_star = 1
-                item_type = ItemType.LIMITED
             else:
                 # 小保底，50/50
-                is_limited = random.random() < 0.5
-                self.last_limited_five_star = 1 if is_limited else 0
-                item_type = ItemType.LIMITED if is_limited else ItemType.STANDARD
-            
-            return GachaResult(
-                ItemRarity.FIVE_STAR,
-                item_type,
-                self._get_random_item(ItemRarity.FIVE_STAR, item_type)
-            )
+                self.last_limited_five_star = 1 if self.rng.random() < self.rates.limited_five_star_prob else 0
+            rarity, type_code = 5, self.last_limited_five_star
                 
         elif rand < p5 + p4:
             # 抽中四星，重置四星计数器
             self.since_last_four_star = 0
-            # 四星50/50，无保底
-            item_type = ItemType.LIMITED if random.random() < 0.5 else ItemType.STANDARD
-            return GachaResult(
-                ItemRarity.FOUR_STAR,
-                item_type,
-                self._get_random_item(ItemRarity.FOUR_STAR, item_type)
-            )
+            # 四星限定/常驻，无保底
+            rarity, type_code = 4, TYPE_LIMITED if self.rng.random() < self.rates.limited_four_star_prob else TYPE_STANDARD
         else:
             # 抽中三星
-            return GachaResult(ItemRarity.THREE_STAR, ItemType.STANDARD, self._get_random_item(ItemRarity.THREE_STAR, None))
+            rarity, type_code = 3, TYPE_STANDARD
+
+        pool_id = _pool_id(rarity, type_code)
+        return rarity, type_code, pool_id, self.pools[pool_id].sample(self.rng.random()), pity
+
+    def pull(self) -> GachaResult:
+        rarity, type_code, pool_id, index, _ = self._pull_codes()
+        return GachaResult(
+            _RARITIES[rarity],
+            ItemType.LIMITED if type_code == TYPE_LIMITED else ItemType.STANDARD,
+            self.pools[pool_id].names[index]
+        )
 
     def pull_multi(self, times=10):
         return [self.pull() for _ in range(times)]
+
+    def pull_into(self, log: PullLog, times: int = 1) -> PullLog:
+        """逐抽模拟，结果直接写入PullLog而不构造GachaResult"""
+        append = log.append
+        for _ in range(times):
+            rarity, type_code, _, index, pity = self._pull_codes()
+            append(rarity, type_code, index, pity)
+        return log
+
+    def pull_batch(self, n: int, rng=None, log: PullLog = None) -> BatchResult:
+        """批量抽卡：用NumPy一次推进n抽的保底计数器
+
+        结果与逐次调用pull()同分布（但消耗的随机数流不同）。
+        rng为numpy.random.Generator，缺省时使用本实例随机数源对应的Generator。
+        给定log时结果同时追加到PullLog。
+
+        内存：结果每抽8字节；中间数组每抽约70~80字节，超过BATCH_CHUNK抽时分块计算，
+        所以峰值内存约为 8·n + 80·BATCH_CHUNK 字节（默认分块约20 MiB）。
+        """
+        import numpy as np
+        if rng is None:
+            rng = self.rng.numpy_generator()
+        n = max(int(n), 0)
+        if n <= BATCH_CHUNK:
+            batch = self._pull_chunk(n, rng)
+        else:
+            batch = BatchResult(np.empty(n, np.int8), np.empty(n, np.int8), np.empty(n, np.int32), np.empty(n, np.int16))
+            for start in range(0, n, BATCH_CHUNK):
+                chunk = self._pull_chunk(min(BATCH_CHUNK, n - start), rng)
+                for name in ('rarity', 'item_type', 'item_index', 'pity'):
+                    getattr(batch, name)[start:start + len(chunk)] = getattr(chunk, name)
+        if log is not None:
+            log.extend(batch.rarity, batch.item_type, batch.item_index, batch.pity)
+        return batch
+
+    def _pull_chunk(self, n: int, rng) -> BatchResult:
+        """pull_batch的一块，下标数组用int32以减少中间数组的内存"""
+        import numpy as np
+        if n == 0:
+            return BatchResult(np.zeros(0, np.int8), np.zeros(0, np.int8), np.zeros(0, np.int32), np.zeros(0, np.int16))
+
+        idx = np.arange(n, dtype=np.int32)
+        c5 = min(self.since_last_five_star, self.step_end - 1)
+        c4 = self.since_last_four_star
+
+        # 1. 五星：两次五星之间的间隔独立同分布，用逆CDF一次采样所有间隔
+        p5_table = self.rates.five_star_array
+        survival = np.concatenate(([1.0], np.cumprod(1 - p5_table[1:])))
+        cdf = 1 - survival
+
+        def sample_pity(start, size):
+            # 从保底计数start出发，下一次出五星时的计数
+            target = cdf[start] + rng.random(size) * survival[start]
+            return np.clip(np.searchsorted(cdf, target, side='right'), start + 1, self.step_end)
+
+        mean_gap = survival[:-1].sum()
+        gaps = [sample_pity(c5, 1) - c5]
+        covered = int(gaps[0][0])
+        while covered < n:
+            block = sample_pity(0, int((n - covered) / mean_gap * 1.05) + 16)
+            gaps.append(block)
+            covered += int(block.sum())
+        five_pos = np.cumsum(np.concatenate(gaps)) - 1
+        five_pos = five_pos[five_pos < n].astype(np.int32)
+        k = len(five_pos)
+
+        # 2. 大小保底：连续歪的一段内，常驻与（大保底）限定交替出现
+        five_standard = np.zeros(k, dtype=bool)
+        if k:
+            lost = rng.random(k) >= self.rates.limited_five_star_prob
+            last_win = np.maximum.accumulate(np.where(~lost, np.arange(k), -1))
+            run_pos = np.arange(k) - last_win
+            flip = (last_win < 0) if self.last_limited_five_star == 0 else False
+            five_standard = lost & ((run_pos % 2 == 1) != flip)
+            self.last_limited_five_star = 0 if five_standard[-1] else 1
+
+        is_five = np.zeros(n, dtype=bool)
+        is_five[five_pos] = True
+        last_five = np.full(n, -(c5 + 1), dtype=np.int32)
+        last_five[five_pos] = five_pos
+        np.maximum.accumulate(last_five, out=last_five)
+        pity5 = np.empty(n, dtype=np.int32)
+        pity5[0] = c5 + 1
+        np.subtract(idx[1:], last_five[:-1], out=pity5[1:])
+        np.minimum(pity5, self.step_end, out=pity5)
+
+        # 3. 四星：非五星时按条件概率自然出四星；计数到四星保底时强制出四星
+        # 条件概率只取决于五星计数，按计数查表而不是逐抽计算
+        p5_cells = p5_table[:self.step_end + 1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            q4_table = np.where(p5_cells < 1, self.rates.four_star_array[:self.step_end + 1, 0] / (1 - p5_cells), 0.0)
+        hits = np.flatnonzero(~is_five & (rng.random(n) < q4_table[pity5])).astype(np.int32)
+
+        # next_non_five[t]: 位置t及之后第一个非五星的位置
+        next_non_five = np.where(is_five, np.int32(n), idx)
+        next_non_five = np.append(np.minimum.accumulate(next_non_five[::-1])[::-1], np.int32(n))
+        del idx
+
+        # 自然四星之间，从上一次四星出发每隔four_star_pity抽（跳过五星）强制出一次四星
+        starts = np.concatenate((np.array([-(c4 + 1)], dtype=np.int32), hits))
+        limits = np.append(hits, np.int32(n))
+        forced = []
+        cur = next_non_five[np.clip(starts + self.rates.four_star_pity, 0, n)]
+        mask = cur < limits
+        while mask.any():
+            starts, limits = cur[mask], limits[mask]
+            forced.append(starts)
+            cur = next_non_five[np.clip(starts + self.rates.four_star_pity, 0, n)]
+            mask = cur < limits
+        four_pos = np.concatenate([hits] + forced)
+
+        rarity = np.full(n, 3, dtype=np.int8)
+        rarity[four_pos] = 4
+        rarity[five_pos] = 5
+        item_type = np.zeros(n, dtype=np.int8)
+        item_type[four_pos] = rng.random(len(four_pos)) < self.rates.limited_four_star_prob
+        item_type[five_pos] = ~five_standard
+
+        # 4. 每个池用别名表一次抽出所有下标
+        item_index = sample_pool_indices(self.pools, pool_id_array(rarity, item_type), rng.random(n))
+
+        # 更新计数器到第n抽之后的状态
+        self.since_last_five_star = int(n - 1 - last_five[-1])
+        last_four = int(four_pos.max()) if len(four_pos) else -(c4 + 1)
+        self.since_last_four_star = n - 1 - last_four
+
+        return BatchResult(rarity, item_type, item_index, pity5.astype(np.int16))
@@ -0,0 +1,150 @@
+"""磁盘上的抽卡记录
+
+文件格式：
+    文件头（HEADER_SIZE字节）：MAGIC + 卡池参数JSON，不足部分补0
+    记录区：每抽一条定长记录（RECORD_DTYPE，8字节），只追加不修改
+读取时用numpy.memmap直接映射记录区，统计按块流式进行，不需要把整个文件读进内存。
+"""
+import json
+from pathlib import Path
+import numpy as np
+from gacha import BannerRates, DEFAULT_RATES, GachaSystem, TYPE_LIMITED
+from online_stats import RateAccumulator
+
+MAGIC = b'GACHAHST\x01'
+HEADER_SIZE = 256
+RECORD_DTYPE = np.dtype([('rarity', 'i1'), ('item_type', 'i1'), ('item_index', '<i4'), ('pity', '<i2')])
+DEFAULT_CHUNK = 1 << 20
+
+
+def _encode_header(rates: BannerRates) -> bytes:
+    header = MAGIC + json.dumps(rates.params(), sort_keys=True).encode('utf-8')
+    if len(header) > HEADER_SIZE:
+        raise ValueError("卡池参数过长，无法写入文件头")
+    return header.ljust(HEADER_SIZE, b'\0')
+
+
+def _decode_header(header: bytes) -> BannerRates:
+    if not header.startswith(MAGIC):
+        raise ValueError("不是抽卡记录文件")
+    return BannerRates(**json.loads(header[len(MAGIC):].rstrip(b'\0')))
+
+
+class HistoryWriter:
+    """按块追加记录；文件已存在时校验卡池参数后续写
+
+    文件末尾不完整的记录（写入中断留下的）在续写前截掉，否则之后的记录全部错位。
+    """
+
+    def __init__(self, path, rates: BannerRates = DEFAULT_RATES):
+        self.path = Path(path)
+        self.rates = rates
+        header = _encode_header(rates)
+        if self.path.exists() and self.path.stat().st_size >= HEADER_SIZE:
+            with open(self.path, 'rb') as f:
+                if f.read(HEADER_SIZE) != header:
+                    raise ValueError(f"{self.path} 的卡池参数与当前不一致")
+            partial = (self.path.stat().st_size - HEADER_SIZE) % RECORD_DTYPE.itemsize
+            if partial:
+                with open(self.path, 'r+b') as f:
+                    f.truncate(self.path.stat().st_size - partial)
+            self._file = open(self.path, 'ab')
+        else:
+            self._file = open(self.path, 'wb')
+            self._file.write(header)
+
+    def write(self, rarity, item_type, item_index, pity):
+        records = np.empty(len(rarity), dtype=RECORD_DTYPE)
+        records['rarity'] = rarity
+        records['item_type'] = item_type
+        records['item_index'] = item_index
+        records['pity'] = pity
+        self._file.write(records.tobytes())
+
+    def write_batch(self, batch):
+        self.write(batch.rarity, batch.item_type, batch.item_index, batch.pity)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PullHistory:
+    """只读打开记录文件，记录区为零拷贝的memmap"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            self.rates = _decode_header(f.read(HEADER_SIZE))
+        count = (self.path.stat().st_size - HEADER_SIZE) // RECORD_DTYPE.itemsize
+        if count:
+            self.records = np.memmap(self.path, dtype=RECORD_DTYPE, mode='r', offset=HEADER_SIZE, shape=(count,))
+        else:
+            self.records = np.zeros(0, dtype=RECORD_DTYPE)
+
+    def __len__(self):
+        return len(self.records)
+
+    def iter_chunks(self, chunk_size: int = DEFAULT_CHUNK):
+        for start in range(0, len(self.records), chunk_size):
+            yield self.records[start:start + chunk_size]
+
+    def restore_state(self, gacha: GachaSystem):
+        """由记录末尾推出保底计数器，让模拟可以接着上次继续"""
+        n = len(self.records)
+        gacha.since_last_five_star = gacha.since_last_four_star = n
+        gacha.last_limited_five_star = 1
+        found_five = found_four = False
+        for chunk_end in range(n, 0, -DEFAULT_CHUNK):
+            chunk = np.asarray(self.records['rarity'][max(chunk_end - DEFAULT_CHUNK, 0):chunk_end])
+            start = chunk_end - len(chunk)
+            if not found_five and (chunk == 5).any():
+                last = start + int(np.flatnonzero(chunk == 5)[-1])
+                gacha.since_last_five_star = n - 1 - last
+                gacha.last_limited_five_star = int(self.records['item_type'][last] == TYPE_LIMITED)
+                found_five = True
+            if not found_four and (chunk == 4).any():
+                gacha.since_last_four_star = n - 1 - (start + int(np.flatnonzero(chunk == 4)[-1]))
+                found_four = True
+            if found_five and found_four:
+                break
+        return gacha
+
+    def accumulate(self, chunk_size: int = DEFAULT_CHUNK) -> RateAccumulator:
+        """流式扫描整个文件，返回可合并的统计量"""
+        accumulator = RateAccumulator(self.rates.step_end)
+        for chunk in self.iter_chunks(chunk_size):
+            accumulator.update(chunk['rarity'], chunk['item_type'], chunk['pity'])
+        return accumulator
+
+    def statistics(self, chunk_size: int = DEFAULT_CHUNK) -> dict:
+        """流式统计，格式兼容compare_theory_and_practice
+
+        五星位置不再逐个保存，改为出金时保底计数的直方图（长度step_end+1）。
+        """
+        accumulator = self.accumulate(chunk_size)
+        results = accumulator.results()
+        results['five_star_pity_hist'] = accumulator.gap_hist
+        return results
+
+
+def simulate_to_history(path, num_trials: int, seed=None, rates: BannerRates = DEFAULT_RATES,
+                        chunk_size: int = DEFAULT_CHUNK) -> int:
+    """把num_trials抽追加到记录文件；文件已存在时从其末尾的保底状态继续，返回文件中的总抽数
+
+    随机数流由 (seed, 文件中已有的抽数) 派生，同一个seed多次续写不会重复前一次的随机数。
+    """
+    history = PullHistory(path) if Path(path).exists() and Path(path).stat().st_size >= HEADER_SIZE else None
+    existing = len(history) if history is not None else 0
+    gacha = GachaSystem(np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(existing,))), rates)
+    if history is not None:
+        history.restore_state(gacha)
+    with HistoryWriter(path, rates) as writer:
+        for start in range(0, num_trials, chunk_size):
+            writer.write_batch(gacha.pull_batch(min(chunk_size, num_trials - start)))
+    return len(PullHistory(path))
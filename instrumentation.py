@@ -0,0 +1,203 @@
+"""抽卡流程的可选埋点与性能剖析
+
+埋点默认关闭：GachaSystem不做任何检查，开销为零。
+instrument(gacha)会在该实例上用带计时的版本覆盖pull/_pull_codes/_get_adjusted_probabilities，
+并把随机数源和物品池换成计时代理；uninstrument(gacha)恢复原样。
+计时本身（perf_counter）有几十纳秒的开销，各阶段耗时只适合相互比较。
+"""
+import cProfile
+import io
+import pstats
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+
+STAGES = ('rng', 'probability', 'item_selection', 'pull_codes', 'construction')
+
+
+class PullStats:
+    """事件计数与分阶段耗时"""
+
+    def __init__(self):
+        self.events = Counter()
+        self.seconds = Counter()
+        self.calls = Counter()
+
+    def add_time(self, stage: str, seconds: float):
+        self.seconds[stage] += seconds
+        self.calls[stage] += 1
+
+    def reset(self):
+        self.events.clear()
+        self.seconds.clear()
+        self.calls.clear()
+
+    def to_dict(self) -> dict:
+        return {
+            'events': dict(self.events),
+            'stages': {stage: {'seconds': self.seconds[stage], 'calls': self.calls[stage]}
+                       for stage in STAGES if self.calls[stage]}
+        }
+
+    def to_prometheus(self, prefix: str = 'gacha') -> str:
+        """Prometheus文本格式"""
+        lines = [f'# TYPE {prefix}_events_total counter']
+        lines += [f'{prefix}_events_total{{event="{event}"}} {count}' for event, count in sorted(self.events.items())]
+        lines.append(f'# TYPE {prefix}_stage_seconds_total counter')
+        lines += [f'{prefix}_stage_seconds_total{{stage="{stage}"}} {self.seconds[stage]:.9f}'
+                  for stage in STAGES if self.calls[stage]]
+        lines.append(f'# TYPE {prefix}_stage_calls_total counter')
+        lines += [f'{prefix}_stage_calls_total{{stage="{stage}"}} {self.calls[stage]}'
+                  for stage in STAGES if self.calls[stage]]
+        return '\n'.join(lines) + '\n'
+
+
+class _TimedRandomSource:
+    def __init__(self, source, stats: PullStats):
+        self.source = source
+        self.stats = stats
+
+    def random(self):
+        start = time.perf_counter()
+        value = self.source.random()
+        self.stats.add_time('rng', time.perf_counter() - start)
+        return value
+
+    def choice(self, seq):
+        start = time.perf_counter()
+        value = self.source.choice(seq)
+        self.stats.add_time('rng', time.perf_counter() - start)
+        return value
+
+    def numpy_generator(self):
+        return self.source.numpy_generator()
+
+
+class _TimedPool:
+    def __init__(self, pool, stats: PullStats):
+        self.pool = pool
+        self.names = pool.names
+        self.stats = stats
+
+    def __len__(self):
+        return len(self.pool)
+
+    def sample(self, u):
+        start = time.perf_counter()
+        index = self.pool.sample(u)
+        self.stats.add_time('item_selection', time.perf_counter() - start)
+        return index
+
+    def sample_indices(self, u):
+        return self.pool.sample_indices(u)
+
+
+def instrument(gacha, stats: PullStats = None) -> PullStats:
+    """为一个GachaSystem实例打开埋点，返回收集数据的PullStats"""
+    stats = stats or PullStats()
+    cls = type(gacha)
+    gacha.rng = _TimedRandomSource(gacha.rng, stats)
+    gacha.pools = [_TimedPool(pool, stats) for pool in gacha.pools]
+
+    def probabilities():
+        start = time.perf_counter()
+        result = cls._get_adjusted_probabilities(gacha)
+        stats.add_time('probability', time.perf_counter() - start)
+        return result
+
+    def pull_codes():
+        guaranteed = gacha.last_limited_five_star == 0
+        four_star_pity = gacha.since_last_four_star + 1 >= gacha.rates.four_star_pity
+        start = time.perf_counter()
+        codes = cls._pull_codes(gacha)
+        stats.add_time('pull_codes', time.perf_counter() - start)
+
+        rarity = codes[0]
+        stats.events['pulls'] += 1
+        if rarity == 5:
+            stats.events['five_star'] += 1
+            if guaranteed:
+                stats.events['guarantee_triggered'] += 1
+            elif gacha.last_limited_five_star == 0:
+                stats.events['lost_fifty_fifty'] += 1
+        elif rarity == 4:
+            stats.events['four_star'] += 1
+            if four_star_pity:
+                stats.events['four_star_pity'] += 1
+        return codes
+
+    def pull():
+        start = time.perf_counter()
+        before = stats.seconds['pull_codes']
+        result = cls.pull(gacha)
+        # 构造GachaResult的耗时 = 整次pull - 核心逻辑
+        stats.add_time('construction', time.perf_counter() - start - (stats.seconds['pull_codes'] - before))
+        return result
+
+    gacha._get_adjusted_probabilities = probabilities
+    gacha._pull_codes = pull_codes
+    gacha.pull = pull
+    gacha.stats = stats
+    return stats
+
+
+def uninstrument(gacha):
+    """关闭埋点，恢复原来的随机数源和物品池"""
+    for name in ('_get_adjusted_probabilities', '_pull_codes', 'pull', 'stats'):
+        gacha.__dict__.pop(name, None)
+    if isinstance(gacha.rng, _TimedRandomSource):
+        gacha.rng = gacha.rng.source
+    gacha.pools = tuple(pool.pool if isinstance(pool, _TimedPool) else pool for pool in gacha.pools)
+
+
+class ProfileReport:
+    def __init__(self):
+        self.stats_text = ''
+        self.peak_memory = 0
+        self.seconds = 0.0
+
+    def to_dict(self) -> dict:
+        return {'seconds': self.seconds, 'peak_memory': self.peak_memory, 'profile': self.stats_text}
+
+
+@contextmanager
+def profiled(sort: str = 'cumulative', limit: int = 20, memory: bool = True):
+    """在cProfile（和可选的tracemalloc）下运行一段代码
+
+        with profiled() as report:
+            analyzer.prob_distribution_by_pulls()
+        print(report.stats_text, report.peak_memory)
+    """
+    report = ProfileReport()
+    profiler = cProfile.Profile()
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        yield report
+    finally:
+        profiler.disable()
+        report.seconds = time.perf_counter() - start
+        if memory:
+            report.peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats(sort).print_stats(limit)
+        report.stats_text = output.getvalue()
+
+
+def profile(func=None, **options):
+    """装饰器版本的profiled，报告保存在被装饰函数的last_profile属性上"""
+    def decorate(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            with profiled(**options) as report:
+                result = f(*args, **kwargs)
+            wrapper.last_profile = report
+            return result
+        wrapper.last_profile = None
+        return wrapper
+    return decorate(func) if func is not None else decorate
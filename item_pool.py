@@ -0,0 +1,73 @@
+from functools import cached_property
+
+
+class ItemPool:
+    """编译后的物品池：整数下标 + Walker/Vose别名表，O(1)按权重抽取
+
+    items.json中池的元素可以是名称字符串（权重1），
+    也可以是 {"name": ..., "weight": ...}，用于池内的概率UP。
+    """
+
+    def __init__(self, names, weights=None):
+        self.names = tuple(names)
+        weights = [1.0] * len(self.names) if weights is None else [float(w) for w in weights]
+        total = sum(weights)
+        self.weights = tuple(w / total for w in weights)
+        # 别名表用Python列表构建和保存，逐抽路径既不需要NumPy也没有NumPy标量的开销
+        self._prob_list, self._alias_list = self._build_alias(self.weights)
+
+    @classmethod
+    def from_config(cls, entries):
+        names, weights = [], []
+        for entry in entries:
+            if isinstance(entry, dict):
+                names.append(entry['name'])
+                weights.append(entry.get('weight', 1))
+            else:
+                names.append(entry)
+                weights.append(1)
+        return cls(names, weights)
+
+    @staticmethod
+    def _build_alias(weights):
+        n = len(weights)
+        scaled = [w * n for w in weights]
+        prob = [1.0] * n
+        alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1]
+        large = [i for i, p in enumerate(scaled) if p >= 1]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            prob[s] = scaled[s]
+            alias[s] = l
+            scaled[l] += scaled[s] - 1
+            (small if scaled[l] < 1 else large).append(l)
+        # 剩下的（含浮点误差）概率都是1
+        return prob, alias
+
+    # 向量化抽取用的NumPy别名表，第一次批量抽取时才构建
+    @cached_property
+    def prob(self) -> 'np.ndarray':
+        import numpy as np
+        return np.array(self._prob_list)
+
+    @cached_property
+    def alias(self) -> 'np.ndarray':
+        import numpy as np
+        return np.array(self._alias_list)
+
+    def __len__(self):
+        return len(self.names)
+
+    def sample(self, u: float) -> int:
+        """用一个[0, 1)均匀随机数抽出物品下标：整数部分选格子，小数部分决定是否取别名"""
+        x = u * len(self.names)
+        i = min(int(x), len(self.names) - 1)
+        return i if x - i < self._prob_list[i] else self._alias_list[i]
+
+    def sample_indices(self, u: 'np.ndarray') -> 'np.ndarray':
+        """sample的向量化版本，一次抽出整组下标"""
+        import numpy as np
+        x = u * len(self.names)
+        i = np.minimum(x.astype(np.int32), len(self.names) - 1)
+        return np.where(x - i < self.prob[i], i, self.alias[i]).astype(np.int32)
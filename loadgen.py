@@ -0,0 +1,60 @@
+"""抽卡服务的压测脚本：模拟大量并发用户，统计每秒请求数和延迟分位数
+
+    python loadgen.py --users 2000 --duration 10
+"""
+import argparse
+import asyncio
+import random
+import time
+import numpy as np
+from service import GachaService
+
+
+async def virtual_user(service: GachaService, user_id: str, deadline: float, latencies: list, rng: random.Random):
+    while time.perf_counter() < deadline:
+        count = 10 if rng.random() < 0.3 else 1
+        start = time.perf_counter()
+        await service.pull(user_id, count)
+        latencies.append(time.perf_counter() - start)
+        # 让出事件循环，模拟请求之间的间隔
+        await asyncio.sleep(0)
+
+
+async def run(users: int, duration: float, state_dir=None, seed: int = 0) -> dict:
+    service = GachaService(state_dir=state_dir, seed=seed)
+    await service.start()
+    latencies = []
+    rng = random.Random(seed)
+    deadline = time.perf_counter() + duration
+    start = time.perf_counter()
+    await asyncio.gather(*(virtual_user(service, f"user_{i}", deadline, latencies, rng) for i in range(users)))
+    elapsed = time.perf_counter() - start
+    await service.stop()
+
+    latencies = np.array(latencies) * 1000
+    return {
+        'requests': len(latencies),
+        'requests_per_second': len(latencies) / elapsed,
+        'batches': service.batches,
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'max_ms': float(latencies.max())
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=1000, help='并发用户数')
+    parser.add_argument('--duration', type=float, default=10.0, help='压测时长（秒）')
+    parser.add_argument('--state-dir', help='状态快照目录，不指定则不写盘')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.users, args.duration, args.state_dir, args.seed))
+    print(f"请求数: {report['requests']}  合并批次: {report['batches']}")
+    print(f"吞吐: {report['requests_per_second']:.0f} 请求/秒")
+    print(f"延迟: p50 {report['p50_ms']:.2f} ms  p99 {report['p99_ms']:.2f} ms  最大 {report['max_ms']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
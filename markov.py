@@ -0,0 +1,196 @@
+from functools import lru_cache
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import spsolve
+from scipy.stats import binom
+from gacha import BannerRates
+
+
+class JointPityChain:
+    """五星保底、四星保底、大小保底的联合马尔可夫链
+
+    状态为抽卡前的 (距离上次五星l, 距离上次四星c, 是否大保底g)：
+        l: 0 ~ step_end-1
+        c: 0 ~ four_star_pity-1，最后一格表示"下一抽必定触发四星保底"（计数>=9合并为一格）
+        g: 0小保底 1大保底
+    四星计数在出五星时不重置，所以与五星计数真正耦合，不能分开计算。
+    """
+
+    def __init__(self, rates: BannerRates):
+        self.banner_rates = rates
+        # p5[i] 为距离上次五星第i+1抽的五星概率
+        self.p5 = rates.five_star_array[1:]
+        self.four_star_pity = rates.four_star_pity
+        self.shape = (len(self.p5), self.four_star_pity, 2)
+        self.num_states = int(np.prod(self.shape))
+        self.transition, self.p5_by_state, self.p4_by_state = self._build()
+        self._stationary = None
+
+    def _index(self, l, c, g):
+        return np.ravel_multi_index((l, c, g), self.shape)
+
+    def _build(self):
+        l, c, g = (axis.ravel() for axis in np.indices(self.shape))
+        src = self._index(l, c, g)
+        last_c = self.four_star_pity - 1
+
+        p5 = self.p5[l]
+        p4 = self.banner_rates.four_star_array[l + 1, c + 1]
+        p3 = np.clip(1 - p5 - p4, 0, None)
+
+        next_l = np.minimum(l + 1, len(self.p5) - 1)  # 第step_end抽p5=1，此处的取值不会被用到
+        next_c = np.minimum(c + 1, last_c)
+        zeros = np.zeros_like(l)
+
+        def event(dst, prob):
+            return sparse.csr_matrix((prob, (src, dst)), shape=(self.num_states, self.num_states))
+
+        # 按抽卡结果分开保存转移，计数分布的DP需要知道每条转移对应什么结果
+        # 五星：五星计数归零，四星计数继续增加
+        win = self.banner_rates.limited_five_star_prob
+        self.events = {
+            # 出限定，回到小保底
+            'five_limited': event(self._index(zeros, next_c, zeros), np.where(g == 1, p5, p5 * win)),
+            # 歪常驻，进入大保底
+            'five_lost': event(self._index(zeros, next_c, zeros + 1), np.where(g == 1, 0.0, p5 * (1 - win))),
+            # 四星：四星计数归零
+            'four': event(self._index(next_l, zeros, g), p4),
+            # 三星：两个计数都增加
+            'three': event(self._index(next_l, next_c, g), p3)
+        }
+        matrix = sum(self.events.values()).tocsr()
+        return matrix, p5, p4
+
+    def stationary(self) -> np.ndarray:
+        """直接求解 pi P = pi, sum(pi) = 1，返回形状为 (l, c, g) 的稳态分布"""
+        if self._stationary is None:
+            system = (self.transition.T - sparse.identity(self.num_states)).tolil()
+            # 用归一化条件替换一个冗余方程
+            system[0, :] = 1.0
+            rhs = np.zeros(self.num_states)
+            rhs[0] = 1.0
+            pi = spsolve(system.tocsc(), rhs)
+            pi = np.clip(pi, 0, None)
+            self._stationary = pi / pi.sum()
+        return self._stationary.reshape(self.shape)
+
+    def rates(self) -> dict:
+        """稳态下每抽的五星率、四星率、限定五星率"""
+        pi = self.stationary().ravel()
+        guaranteed = np.indices(self.shape)[2].ravel() == 1
+        limited_share = np.where(guaranteed, 1.0, self.banner_rates.limited_five_star_prob)
+        return {
+            'five_star_rate': float(pi @ self.p5_by_state),
+            'four_star_rate': float(pi @ self.p4_by_state),
+            'limited_rate': float(pi @ (self.p5_by_state * limited_share))
+        }
+
+    def _lumped(self, matrix, axes: tuple) -> sparse.csr_matrix:
+        """把转移矩阵投影到只保留axes这几个分量的状态上
+
+        调用方保证投影后的链可归并（被丢掉的分量不影响保留分量的转移概率），
+        所以每个归并状态取被丢分量全为0的那个原状态的行即可。
+        """
+        coords = np.indices(self.shape).reshape(len(self.shape), -1)
+        lumped_shape = tuple(self.shape[axis] for axis in axes)
+        lumped = np.ravel_multi_index(tuple(coords[axis] for axis in axes), lumped_shape)
+        size = int(np.prod(lumped_shape))
+        dropped = [axis for axis in range(len(self.shape)) if axis not in axes]
+        representative = np.flatnonzero(np.all(coords[dropped] == 0, axis=0))
+        select = sparse.csr_matrix((np.ones(size), (lumped[representative], representative)),
+                                   shape=(size, self.num_states))
+        project = sparse.csr_matrix((np.ones(self.num_states), (np.arange(self.num_states), lumped)),
+                                    shape=(self.num_states, size))
+        return (select @ matrix @ project).tocsr()
+
+    def count_distributions(self, pulls: int, since_five: int = 0, since_four: int = 0,
+                            guaranteed: bool = False, tol: float = 1e-16) -> dict:
+        """从给定保底状态出发抽pulls次，各类结果数量的精确分布，下标为数量
+
+        返回 five_star, limited_five_star, four_star, limited_four_star 四个分布。
+        每种计数只在决定它的状态分量上推进（五星: l；限定五星: (l, g)；四星: (l, c)），
+        每抽的代价为 转移非零元个数 × 当前计数支撑宽度。
+        两端质量低于tol的计数列会被截掉，支撑宽度约为计数标准差的16倍，随抽数按√pulls增长，
+        所以总代价为 O(nnz × pulls^1.5)，不是 状态数 × 抽数。
+        四星一项（900个状态、约2700个非零元）占大部分时间：默认卡池下1000抽约0.3秒，
+        3000抽约1.3秒，5000抽约2.5秒。
+        """
+        start = (min(since_five, self.shape[0] - 1), min(since_four, self.four_star_pity - 1), int(guaranteed))
+        e = self.events
+        five = self._count_pmf(e['four'] + e['three'], e['five_limited'] + e['five_lost'], (0,), start, pulls, tol)
+        limited = self._count_pmf(e['four'] + e['three'] + e['five_lost'], e['five_limited'],
+                                  (0, 2), start, pulls, tol)
+        four = self._count_pmf(e['five_limited'] + e['five_lost'] + e['three'], e['four'],
+                               (0, 1), start, pulls, tol)
+        return {
+            'five_star': five,
+            'limited_five_star': limited,
+            'four_star': four,
+            # 每个四星独立地以limited_four_star_prob为限定，对四星数做二项稀疏化
+            'limited_four_star': _binomial_thinning(four, self.banner_rates.limited_four_star_prob)
+        }
+
+    def _count_pmf(self, keep, gain, axes: tuple, start: tuple, pulls: int, tol: float) -> np.ndarray:
+        """keep为计数不变的转移，gain为计数+1的转移；state[i, k]为处于状态i且计数为lo+k的概率"""
+        lumped_shape = tuple(self.shape[axis] for axis in axes)
+        size = int(np.prod(lumped_shape))
+        # 两种转移叠成一个矩阵，每抽只做一次稀疏乘法
+        step = sparse.vstack([self._lumped(keep, axes).T, self._lumped(gain, axes).T]).tocsr()
+        state = np.zeros((size, 1))
+        state[np.ravel_multi_index(tuple(start[axis] for axis in axes), lumped_shape), 0] = 1.0
+        lo = 0
+        for i in range(pulls):
+            moved = step @ state
+            state = np.empty((size, state.shape[1] + 1))
+            state[:, :-1] = moved[:size]
+            state[:, -1] = 0.0
+            state[:, 1:] += moved[size:]
+            if i % 8 == 7:
+                mass = state.sum(axis=0)
+                first = int(np.searchsorted(np.cumsum(mass), tol, side='right'))
+                last = len(mass) - int(np.searchsorted(np.cumsum(mass[::-1]), tol, side='right'))
+                state = state[:, first:last]
+                lo += first
+        pmf = np.zeros(lo + state.shape[1])
+        pmf[lo:] = state.sum(axis=0)
+        return pmf
+
+
+def _binomial_thinning(pmf: np.ndarray, prob: float) -> np.ndarray:
+    """N服从pmf时，N次独立伯努利(prob)成功次数的分布"""
+    support = np.flatnonzero(pmf)
+    successes = np.arange(len(pmf))
+    return binom.pmf(successes[:, None], support[None, :], prob) @ pmf[support]
+
+
+@lru_cache(maxsize=None)
+def pity_chain_for(rates: BannerRates) -> JointPityChain:
+    """同一组卡池参数只构建、求解一次联合链"""
+    return JointPityChain(rates)
+
+
+@lru_cache(maxsize=None)
+def limited_transition_matrices(rates: BannerRates):
+    """只追踪五星保底和大小保底的单抽转移矩阵，状态下标为 k*step_end + l
+
+    k: 当前是否在大保底(0:小保底, 1:大保底)
+    l: 距离上次五星的抽数(0 ~ step_end-1)
+    返回 (A, B)：A为没有获得限定的转移，B为获得一个限定的转移（均为只读）
+    """
+    size = rates.step_end
+    p = rates.five_star_array[1:]
+    win = rates.limited_five_star_prob
+    l = np.arange(size - 1)
+    A = np.zeros((2 * size, 2 * size))
+    B = np.zeros((2 * size, 2 * size))
+    for k in range(2):
+        # 没抽到五星：距离+1（最后一抽必出五星）
+        A[k * size + l, k * size + l + 1] = 1 - p[:-1]
+    # 小保底：出限定（保持小保底）或歪常驻（进入大保底）
+    A[:size, size] += p * (1 - win)
+    B[:size, 0] += p * win
+    # 大保底：必定限定，回到小保底
+    B[size:, 0] += p
+    A.flags.writeable = False
+    B.flags.writeable = False
+    return A, B
@@ -0,0 +1,161 @@
+import math
+import numpy as np
+from gacha import TYPE_LIMITED
+
+# 批均值法的每批抽数：约65个出金周期，保底造成的相关性远短于一批
+BATCH_PULLS = 4096
+
+
+def wilson_interval(successes: int, trials: int, z: float = 1.96) -> tuple:
+    """二项比例的Wilson置信区间"""
+    if trials == 0:
+        return 0.0, 1.0
+    p = successes / trials
+    denom = 1 + z * z / trials
+    center = (p + z * z / (2 * trials)) / denom
+    half = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denom
+    return center - half, center + half
+
+
+class RateAccumulator:
+    """常数内存、可合并的实验统计
+
+    保存计数、出金间隔直方图（不超过step_end）、出金间隔的Welford均值/方差，
+    以及每BATCH_PULLS抽一批的四星数、限定五星数的和与平方和（批均值法的置信区间）。
+    不同进程或不同分块的统计用merge合并，计数与一次性统计相同；
+    各自末尾不满一批的部分只计入计数，不参与批均值。
+    """
+
+    def __init__(self, step_end: int = 90):
+        self.step_end = step_end
+        self.total_pulls = 0
+        self.five_star_count = 0
+        self.four_star_count = 0
+        self.limited_five_star_count = 0
+        self.gap_hist = np.zeros(step_end + 1, dtype=np.int64)
+        # 出金间隔的Welford统计量
+        self.gap_mean = 0.0
+        self.gap_m2 = 0.0
+        # 批均值：[四星, 限定五星]每批计数的和与平方和，以及未满一批的部分
+        self.batch_count = 0
+        self.batch_sum = np.zeros(2, dtype=np.int64)
+        self.batch_sumsq = np.zeros(2, dtype=np.int64)
+        self.pending = np.zeros(2, dtype=np.int64)
+        self.pending_pulls = 0
+
+    def _merge_moments(self, count: int, mean: float, m2: float):
+        # Chan等人的并行Welford合并公式；count为新增的样本数
+        total = self.five_star_count + count
+        if total == 0:
+            return
+        delta = mean - self.gap_mean
+        self.gap_mean += delta * count / total
+        self.gap_m2 += m2 + delta * delta * self.five_star_count * count / total
+
+    def update(self, rarity: np.ndarray, item_type: np.ndarray, pity: np.ndarray):
+        """加入一块抽卡结果，pity为出货时距离上次五星的抽数"""
+        five = rarity == 5
+        gaps = pity[five].astype(float)
+        if len(gaps):
+            mean = gaps.mean()
+            self._merge_moments(len(gaps), mean, float(((gaps - mean) ** 2).sum()))
+            self.gap_hist += np.bincount(pity[five], minlength=self.step_end + 1)
+        self.total_pulls += len(rarity)
+        self.five_star_count += len(gaps)
+        self.four_star_count += int((rarity == 4).sum())
+        self.limited_five_star_count += int((five & (item_type == TYPE_LIMITED)).sum())
+        self._update_batches(np.stack((rarity == 4, five & (item_type == TYPE_LIMITED))))
+        return self
+
+    def _update_batches(self, hits: np.ndarray):
+        """hits为 (2, 抽数) 的布尔数组，接着上次未满的一批按顺序切成批"""
+        take = min(BATCH_PULLS - self.pending_pulls, hits.shape[1])
+        self.pending += hits[:, :take].sum(axis=1)
+        self.pending_pulls += take
+        if self.pending_pulls < BATCH_PULLS:
+            return
+        rest = hits[:, take:]
+        m = rest.shape[1] // BATCH_PULLS
+        counts = np.column_stack((self.pending, rest[:, :m * BATCH_PULLS].reshape(2, m, BATCH_PULLS).sum(axis=2)))
+        self.batch_count += m + 1
+        self.batch_sum += counts.sum(axis=1)
+        self.batch_sumsq += (counts ** 2).sum(axis=1)
+        tail = rest[:, m * BATCH_PULLS:]
+        self.pending = tail.sum(axis=1)
+        self.pending_pulls = tail.shape[1]
+
+    def update_batch(self, batch):
+        return self.update(batch.rarity, batch.item_type, batch.pity)
+
+    def merge(self, other: 'RateAccumulator'):
+        self._merge_moments(other.five_star_count, other.gap_mean, other.gap_m2)
+        self.total_pulls += other.total_pulls
+        self.five_star_count += other.five_star_count
+        self.four_star_count += other.four_star_count
+        self.limited_five_star_count += other.limited_five_star_count
+        self.gap_hist += other.gap_hist
+        self.batch_count += other.batch_count
+        self.batch_sum += other.batch_sum
+        self.batch_sumsq += other.batch_sumsq
+        return self
+
+    @property
+    def gap_variance(self) -> float:
+        return self.gap_m2 / (self.five_star_count - 1) if self.five_star_count > 1 else float('nan')
+
+    def confidence_intervals(self, z: float = 1.96) -> dict:
+        """各概率的置信区间
+
+        五星率 = 1/平均出金间隔，由间隔均值的CLT区间换算（出金间隔独立同分布）；
+        四星率和限定率用批均值法：保底让相邻抽强相关，按独立抽算的二项区间会宽2倍以上。
+        不足两批时退回Wilson区间。
+        """
+        n = self.five_star_count
+        if n > 1:
+            half = z * math.sqrt(self.gap_variance / n)
+            low_gap, high_gap = self.gap_mean - half, self.gap_mean + half
+            five = (1 / high_gap, 1 / low_gap if low_gap > 0 else 1.0)
+        else:
+            five = wilson_interval(n, self.total_pulls, z)
+        return {
+            'five_star_rate': five,
+            'four_star_rate': self._batch_interval(0, self.four_star_count, z),
+            'limited_rate': self._batch_interval(1, self.limited_five_star_count, z)
+        }
+
+    def _batch_interval(self, column: int, successes: int, z: float) -> tuple:
+        b = self.batch_count
+        if b < 2:
+            return wilson_interval(successes, self.total_pulls, z)
+        total, total_sq = int(self.batch_sum[column]), int(self.batch_sumsq[column])
+        variance = max(total_sq - total * total / b, 0.0) / (b - 1)  # 每批计数的样本方差
+        # 批率的方差为variance/B²，N抽的总比例相当于N/B批的均值
+        half = z * math.sqrt(variance / (BATCH_PULLS * self.total_pulls))
+        p = successes / self.total_pulls
+        return max(p - half, 0.0), min(p + half, 1.0)
+
+    def rates(self) -> dict:
+        n = max(self.total_pulls, 1)
+        return {
+            'five_star_rate': self.five_star_count / n,
+            'four_star_rate': self.four_star_count / n,
+            'limited_rate': self.limited_five_star_count / n
+        }
+
+    def results(self) -> dict:
+        """格式兼容compare_theory_and_practice"""
+        return {
+            'total_pulls': self.total_pulls,
+            'five_star_count': self.five_star_count,
+            'four_star_count': self.four_star_count,
+            'limited_five_star_count': self.limited_five_star_count
+        }
+
+    def converged(self, theory: dict, tolerance: float, z: float = 1.96) -> bool:
+        """每个概率的相对误差和置信区间半宽都在tolerance以内"""
+        rates = self.rates()
+        for key, (low, high) in self.confidence_intervals(z).items():
+            target = theory[key]
+            if abs(rates[key] - target) / target > tolerance or (high - low) / 2 / target > tolerance:
+                return False
+        return True
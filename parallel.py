@@ -0,0 +1,55 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from gacha import GachaSystem
+from online_stats import RateAccumulator
+
+# 每个分片的抽数固定，分片划分只取决于总抽数，与进程数无关
+DEFAULT_SHARD_SIZE = 1000000
+
+
+def run_shard(seed_seq: np.random.SeedSequence, num_trials: int) -> RateAccumulator:
+    """在独立的GachaSystem上模拟一个分片，返回可合并的统计量"""
+    gacha = GachaSystem(np.random.default_rng(seed_seq))
+    return RateAccumulator(gacha.rates.step_end).update_batch(gacha.pull_batch(num_trials))
+
+
+def merge_results(shards: list) -> dict:
+    """合并各分片的计数和出金间隔直方图，格式同PullHistory.statistics
+
+    分片之间不是同一条抽卡序列，不能把五星位置拼接起来：跨分片的"间隔"并不存在，
+    只合并每个分片内部的出金时保底计数直方图（长度step_end+1）。
+    """
+    merged = RateAccumulator(shards[0].step_end)
+    for shard in shards:
+        merged.merge(shard)
+    results = merged.results()
+    results['five_star_pity_hist'] = merged.gap_hist
+    return results
+
+
+def shard_sizes(num_trials: int, shard_size: int = DEFAULT_SHARD_SIZE) -> list:
+    """按固定分片大小切分总抽数，最后一片为余数"""
+    sizes = [shard_size] * (num_trials // shard_size)
+    if num_trials % shard_size:
+        sizes.append(num_trials % shard_size)
+    return sizes
+
+
+def parallel_verification(num_trials: int, seed: int = 0, workers: int = None,
+                          shard_size: int = DEFAULT_SHARD_SIZE) -> dict:
+    """多进程实验验证，结果只由seed决定，与workers无关
+
+    每个分片相当于一个独立的玩家：从同一个主SeedSequence派生独立的随机数流，
+    并从初始保底状态开始，分片之间不延续保底计数。
+    """
+    sizes = shard_sizes(num_trials, shard_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(sizes) <= 1:
+        shards = [run_shard(s, n) for s, n in zip(seeds, sizes)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            shards = list(executor.map(run_shard, seeds, sizes))
+    return merge_results(shards)
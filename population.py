@@ -0,0 +1,107 @@
+import numpy as np
+from gacha import BannerRates, DEFAULT_RATES
+
+
+class PlayerPopulation:
+    """同时模拟N个互相独立的玩家，每人的保底状态保存在NumPy数组中"""
+
+    def __init__(self, num_players: int, rng=None, rates: BannerRates = DEFAULT_RATES):
+        self.num_players = num_players
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+        # 概率表与GachaSystem共用
+        self.rates = rates
+        self.step_end = rates.step_end
+
+        # 每个玩家的保底状态，含义同GachaSystem
+        self.since_last_five_star = np.zeros(num_players, dtype=np.int16)
+        self.since_last_four_star = np.zeros(num_players, dtype=np.int16)
+        self.last_limited_five_star = np.ones(num_players, dtype=bool)
+
+        # 每个玩家的统计结果
+        self.pulls = 0
+        self.first_limited_pull = np.full(num_players, -1, dtype=np.int32)  # -1表示尚未获得
+        self.five_star_count = np.zeros(num_players, dtype=np.int32)
+        self.limited_five_star_count = np.zeros(num_players, dtype=np.int32)
+        self.lost_fifty_fifty = np.zeros(num_players, dtype=np.int32)
+        self.four_star_count = np.zeros(num_players, dtype=np.int32)
+
+    def _advance(self, active=None):
+        """推进保底状态一抽，active为None时所有玩家都抽，否则只有active为True的玩家抽"""
+        n = self.num_players
+        if active is None:
+            self.since_last_five_star += 1
+            self.since_last_four_star += 1
+        else:
+            self.since_last_five_star += active
+            self.since_last_four_star += active
+
+        pity5 = np.minimum(self.since_last_five_star, self.step_end)
+        pity4 = np.minimum(self.since_last_four_star, self.rates.four_star_pity)
+        p5 = self.rates.five_star_array[pity5]
+        p4 = self.rates.four_star_array[pity5, pity4]
+
+        rand = self.rng.random(n)
+        five = rand < p5
+        four = ~five & (rand < p5 + p4)
+        if active is not None:
+            five &= active
+            four &= active
+
+        # 五星：大保底必定限定，小保底按limited_five_star_prob
+        win = self.rng.random(n) < self.rates.limited_five_star_prob
+        guaranteed = ~self.last_limited_five_star
+        limited = five & (guaranteed | win)
+        lost = five & ~guaranteed & ~win
+        self.last_limited_five_star = np.where(five, ~lost, self.last_limited_five_star)
+
+        self.since_last_five_star[five] = 0
+        self.since_last_four_star[four] = 0
+        return five, four, limited, lost
+
+    def step(self):
+        """所有玩家各抽一次"""
+        self.pulls += 1
+        five, four, limited, lost = self._advance()
+        self.five_star_count += five
+        self.limited_five_star_count += limited
+        self.lost_fifty_fifty += lost
+        self.four_star_count += four
+        self.first_limited_pull[limited & (self.first_limited_pull < 0)] = self.pulls
+
+    def pull_step(self, active=None):
+        """推进一抽并返回每个玩家本抽的 (稀有度, 类型编码)，不更新统计"""
+        five, four, limited, _ = self._advance(active)
+        rarity = np.full(self.num_players, 3, dtype=np.int8)
+        rarity[four] = 4
+        rarity[five] = 5
+        item_type = limited | (four & (self.rng.random(self.num_players) < self.rates.limited_four_star_prob))
+        return rarity, item_type.astype(np.int8)
+
+    def run(self, num_pulls: int):
+        """所有玩家各抽num_pulls次"""
+        for _ in range(num_pulls):
+            self.step()
+        return self
+
+    def run_until_first_limited(self, max_pulls: int = 180):
+        """抽到所有玩家都获得限定五星为止（大保底保证不超过180抽）"""
+        while self.pulls < max_pulls and (self.first_limited_pull < 0).any():
+            self.step()
+        return self
+
+    def summary(self) -> dict:
+        """汇总玩家间的分布"""
+        got = self.first_limited_pull[self.first_limited_pull > 0]
+        quantiles = [0.1, 0.25, 0.5, 0.75, 0.9, 0.99]
+        return {
+            'players': self.num_players,
+            'pulls': self.pulls,
+            'first_limited_rate': len(got) / self.num_players,
+            'first_limited_mean': float(got.mean()) if len(got) else float('nan'),
+            'first_limited_quantiles': dict(zip(quantiles, np.quantile(got, quantiles).tolist())) if len(got) else {},
+            'five_star_mean': float(self.five_star_count.mean()),
+            'lost_fifty_fifty_mean': float(self.lost_fifty_fifty.mean()),
+            'five_star_hist': np.bincount(self.five_star_count),
+            'lost_fifty_fifty_hist': np.bincount(self.lost_fifty_fifty)
+        }
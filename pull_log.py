@@ -0,0 +1,60 @@
+from array import array
+from typing import NamedTuple
+
+
+class PullRecord(NamedTuple):
+    """一抽的轻量视图，字段均为整数编码"""
+    rarity: int      # 3/4/5
+    item_type: int   # 0常驻 1限定
+    item_index: int  # 物品在对应池中的下标
+    pity: int        # 出货时距离上次五星的抽数
+
+
+# 列名与array类型码：每抽共 1 + 1 + 4 + 2 = 8 字节
+COLUMNS = (('rarity', 'b'), ('item_type', 'b'), ('item_index', 'i'), ('pity', 'h'))
+
+
+class PullLog:
+    """按列存储的抽卡记录，取代GachaResult列表"""
+
+    def __init__(self):
+        for name, typecode in COLUMNS:
+            setattr(self, name, array(typecode))
+
+    def append(self, rarity: int, item_type: int, item_index: int, pity: int):
+        self.rarity.append(rarity)
+        self.item_type.append(item_type)
+        self.item_index.append(item_index)
+        self.pity.append(pity)
+
+    def extend(self, rarity, item_type, item_index, pity):
+        """批量追加，参数为等长的NumPy数组"""
+        import numpy as np
+        for (name, typecode), column in zip(COLUMNS, (rarity, item_type, item_index, pity)):
+            getattr(self, name).frombytes(np.ascontiguousarray(column, dtype=typecode).tobytes())
+
+    def columns(self) -> dict:
+        """各列的NumPy副本
+
+        不返回零拷贝视图：视图存在期间array.array无法扩容，之后的append/extend会抛BufferError。
+        """
+        import numpy as np
+        return {name: np.frombuffer(getattr(self, name), dtype=typecode).copy() for name, typecode in COLUMNS}
+
+    def __len__(self):
+        return len(self.rarity)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            log = PullLog()
+            for name, _ in COLUMNS:
+                setattr(log, name, getattr(self, name)[key])
+            return log
+        return PullRecord(self.rarity[key], self.item_type[key], self.item_index[key], self.pity[key])
+
+    def __iter__(self):
+        return map(PullRecord, self.rarity, self.item_type, self.item_index, self.pity)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).itemsize * len(self) for name, _ in COLUMNS)
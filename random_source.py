@@ -0,0 +1,77 @@
+"""可注入的随机数源
+
+GachaSystem只依赖随机数源的三个方法：
+    random()            返回[0, 1)内的均匀随机数
+    choice(seq)         从序列中等概率选一个元素
+    numpy_generator()   返回批量抽卡使用的numpy.random.Generator
+
+确定性：同一种随机数源用同一个种子构造时，GachaSystem的抽卡结果序列完全确定；
+不同种类的随机数源即使种子相同，随机数流也不同，结果不可互相比较。
+每个GachaSystem持有自己的随机数源，不共享全局random模块的状态。
+NumPy只在用到NumpyRandomSource或numpy_generator()时才导入。
+"""
+import random
+import sys
+
+
+class PythonRandomSource:
+    """基于标准库random.Random（梅森旋转）"""
+
+    def __init__(self, seed=None):
+        self._random = seed if isinstance(seed, random.Random) else random.Random(seed)
+        self.random = self._random.random
+        self.choice = self._random.choice
+
+    def numpy_generator(self) -> 'np.random.Generator':
+        # 从自身的随机数流派生，保证固定种子下批量抽卡同样可复现
+        import numpy as np
+        return np.random.default_rng(self._random.getrandbits(128))
+
+
+class NumpyRandomSource:
+    """基于numpy.random.Generator（默认PCG64）"""
+
+    def __init__(self, seed=None):
+        import numpy as np
+        self.generator = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+
+    def random(self) -> float:
+        return float(self.generator.random())
+
+    def choice(self, seq):
+        return seq[int(self.generator.integers(len(seq)))]
+
+    def numpy_generator(self) -> 'np.random.Generator':
+        return self.generator
+
+
+class BufferedRandomSource(NumpyRandomSource):
+    """一次预取一整块均匀随机数，逐个发放，去掉逐次调用生成器的开销"""
+
+    def __init__(self, seed=None, block_size: int = 65536):
+        super().__init__(seed)
+        self.block_size = block_size
+        self._buffer = []
+        self._pos = 0
+
+    def random(self) -> float:
+        if self._pos >= len(self._buffer):
+            self._buffer = self.generator.random(self.block_size).tolist()
+            self._pos = 0
+        value = self._buffer[self._pos]
+        self._pos += 1
+        return value
+
+    def choice(self, seq):
+        return seq[int(self.random() * len(seq))]
+
+
+def make_random_source(rng=None):
+    """把种子、random.Random、numpy Generator或现成的随机数源统一成随机数源"""
+    if hasattr(rng, 'numpy_generator'):
+        return rng
+    # 还没导入NumPy时，rng不可能是numpy Generator，不必为这个判断导入它
+    np = sys.modules.get('numpy')
+    if np is not None and isinstance(rng, np.random.Generator):
+        return NumpyRandomSource(rng)
+    return PythonRandomSource(rng)
@@ -0,0 +1,125 @@
+"""理论计算结果的缓存：进程内LRU + 磁盘上的.npz文件
+
+键为 (缓存版本, 卡池参数, 查询名, 查询参数) 的哈希，卡池参数一变就自然失效。
+磁盘缓存目录默认取环境变量 GACHA_CACHE_DIR，未设置时为 ~/.cache/toygacha；
+GACHA_CACHE_DIR 设为空字符串时只使用进程内缓存。
+NumPy在第一次计算或读取缓存时才导入。
+"""
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from pathlib import Path
+
+# 计算方法有改动时递增，使旧的磁盘缓存失效
+CACHE_VERSION = 1
+
+
+def _freeze(payload: dict) -> dict:
+    for value in payload.values():
+        value.flags.writeable = False
+    return payload
+
+
+class ResultCache:
+    def __init__(self, cache_dir=None, max_entries: int = 256, max_bytes: int = 256 * 1024 * 1024):
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._memory = OrderedDict()
+
+    @staticmethod
+    def make_key(rates, query: str, args: tuple) -> str:
+        raw = json.dumps([CACHE_VERSION, rates.params(), query, list(args)], sort_keys=True)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get_or_compute(self, rates, query: str, args: tuple, compute) -> dict:
+        """返回 {名称: 只读数组}；依次查进程内缓存、磁盘缓存，都没有时调用compute()
+
+        返回的dict是缓存的浅拷贝，调用方增删键不会影响缓存。
+        """
+        import numpy as np
+        key = self.make_key(rates, query, args)
+        payload = self._memory.get(key)
+        if payload is not None:
+            self._memory.move_to_end(key)
+            return dict(payload)
+
+        payload = self._load(key)
+        if payload is None:
+            payload = {name: np.asarray(value) for name, value in compute().items()}
+            self._store(key, payload)
+        payload = _freeze(payload)
+        self._memory[key] = payload
+        if len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+        return dict(payload)
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.npz"
+
+    def _load(self, key: str):
+        if self.cache_dir is None:
+            return None
+        import numpy as np
+        path = self._path(key)
+        try:
+            with np.load(path) as data:
+                payload = {name: data[name] for name in data.files}
+            os.utime(path)  # 记录最近使用时间，供淘汰使用
+            return payload
+        except (OSError, ValueError):
+            return None
+
+    def _store(self, key: str, payload: dict):
+        if self.cache_dir is None:
+            return
+        import numpy as np
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            # 先写临时文件再改名，避免其他进程读到写了一半的文件
+            tmp = self.cache_dir / f"{key}.{os.getpid()}.tmp"
+            with open(tmp, 'wb') as f:
+                np.savez(f, **payload)
+            os.replace(tmp, self._path(key))
+            self._evict()
+        except OSError:
+            pass
+
+    def _evict(self):
+        """磁盘缓存超过max_bytes时，按最近使用时间从旧到新删除"""
+        entries = []
+        for path in self.cache_dir.glob('*.npz'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+                total -= size
+            except OSError:
+                pass
+
+    def clear(self):
+        self._memory.clear()
+        if self.cache_dir is not None:
+            for path in self.cache_dir.glob('*.npz'):
+                path.unlink(missing_ok=True)
+
+
+_default_cache = None
+
+
+def default_cache() -> ResultCache:
+    global _default_cache
+    if _default_cache is None:
+        cache_dir = os.environ.get('GACHA_CACHE_DIR')
+        if cache_dir is None:
+            cache_dir = Path.home() / '.cache' / 'toygacha'
+        _default_cache = ResultCache(cache_dir or None)
+    return _default_cache
@@ -0,0 +1,198 @@
+"""多用户抽卡服务核心（asyncio）
+
+每个用户的保底状态按用户ID分片保存在内存中；同一轮事件循环内到达的请求
+合并成一次跨用户的向量化抽卡（见PlayerPopulation.pull_step），状态快照定期在
+后台线程写盘，不阻塞事件循环。
+"""
+import asyncio
+import json
+import logging
+import os
+import zlib
+from pathlib import Path
+import numpy as np
+from banner import BannerModel, load_banner
+from gacha import (INITIAL_STATE, GachaResult, ItemRarity, ItemType, TYPE_LIMITED, check_packable, decode_states,
+                   encode_states, pool_id_array, sample_pool_indices)
+from population import PlayerPopulation
+
+logger = logging.getLogger(__name__)
+
+
+class ShardedStateStore:
+    """按用户ID哈希分片的保底状态表（值为PityState.pack打包的整数），记录每个分片是否有未落盘的修改"""
+
+    def __init__(self, num_shards: int = 16):
+        self.shards = [{} for _ in range(num_shards)]
+        self.dirty = set()
+
+    def shard_of(self, user_id: str) -> int:
+        return zlib.crc32(user_id.encode('utf-8')) % len(self.shards)
+
+    def get(self, user_id: str) -> int:
+        return self.shards[self.shard_of(user_id)].get(user_id, INITIAL_STATE)
+
+    def put(self, user_id: str, state: int):
+        shard = self.shard_of(user_id)
+        self.shards[shard][user_id] = state
+        self.dirty.add(shard)
+
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
+
+    def load(self, state_dir: Path):
+        """读取目录下所有shard_*.json，每个用户按当前分片数重新分片
+
+        上次运行的分片数不同时，按新的分片数立即重写全部分片文件，并删除多出来的旧文件，
+        避免旧文件在下次启动时覆盖更新过的状态。
+        """
+        resharded = False
+        for path in state_dir.glob('shard_*.json'):
+            index = int(path.stem.split('_')[1])
+            with open(path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+            for user_id, state in entries.items():
+                shard = self.shard_of(user_id)
+                self.shards[shard][user_id] = state
+                resharded = resharded or shard != index
+            resharded = resharded or index >= len(self.shards)
+        if resharded:
+            self.write_snapshot(state_dir, dict(enumerate(self.shards)))
+            for path in state_dir.glob('shard_*.json'):
+                if int(path.stem.split('_')[1]) >= len(self.shards):
+                    path.unlink()
+        self.dirty.clear()
+
+    def take_snapshot(self) -> dict:
+        """取出有修改的分片的副本（在事件循环线程中调用，写盘交给后台线程）"""
+        snapshot = {i: dict(self.shards[i]) for i in self.dirty}
+        self.dirty.clear()
+        return snapshot
+
+    @staticmethod
+    def write_snapshot(state_dir: Path, snapshot: dict):
+        state_dir.mkdir(parents=True, exist_ok=True)
+        for i, shard in snapshot.items():
+            path = state_dir / f"shard_{i}.json"
+            tmp = path.with_suffix('.tmp')
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(shard, f)
+            os.replace(tmp, path)
+
+
+class GachaService:
+    def __init__(self, banner: BannerModel = None, num_shards: int = 16, state_dir=None,
+                 flush_interval: float = 5.0, seed=None):
+        self.banner = banner or load_banner()
+        check_packable(self.banner.rates)  # 状态表保存打包后的保底状态
+        self.store = ShardedStateStore(num_shards)
+        self.state_dir = Path(state_dir) if state_dir else None
+        self.flush_interval = flush_interval
+        self.rng = np.random.default_rng(seed)
+        self._names = [pool.names for pool in self.banner.pools]
+        self._pending = []
+        self._scheduled = False
+        self._flush_task = None
+        self.batches = 0
+
+    async def start(self):
+        if self.state_dir is not None:
+            self.store.load(self.state_dir)
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+
+    async def flush(self):
+        if self.state_dir is None or not self.store.dirty:
+            return
+        snapshot = self.store.take_snapshot()
+        try:
+            await asyncio.to_thread(ShardedStateStore.write_snapshot, self.state_dir, snapshot)
+        except BaseException:
+            # 写盘失败（或被取消）时分片重新标脏，下次再写
+            self.store.dirty.update(snapshot)
+            raise
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except OSError:
+                logger.exception("保存状态快照失败，下次重试")
+
+    def pull(self, user_id: str, count: int = 1) -> 'asyncio.Future':
+        """提交一次抽卡请求，返回的Future结果为GachaResult列表"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((user_id, count, future))
+        if not self._scheduled:
+            # 本轮事件循环中到达的请求在下一次回调里一起处理
+            self._scheduled = True
+            loop.call_soon(self._process_pending)
+        return future
+
+    def _process_pending(self):
+        requests, self._pending, self._scheduled = self._pending, [], False
+        try:
+            self._process(requests)
+        except Exception as exc:
+            for _, _, future in requests:
+                if not future.done():
+                    future.set_exception(exc)
+
+    def _process(self, requests: list):
+        # 同一用户的多个请求合并，结果按提交顺序切开
+        users = {}
+        for user_id, count, _ in requests:
+            users[user_id] = users.get(user_id, 0) + count
+        user_ids = list(users)
+        counts = np.array([users[user] for user in user_ids])
+
+        population = PlayerPopulation(len(user_ids), self.rng, self.banner.rates)
+        since_five, since_four, last_limited = decode_states([self.store.get(user) for user in user_ids])
+        population.since_last_five_star[:] = since_five
+        population.since_last_four_star[:] = since_four
+        population.last_limited_five_star[:] = last_limited
+
+        steps = int(counts.max())
+        rarity = np.empty((steps, len(user_ids)), dtype=np.int8)
+        item_type = np.empty((steps, len(user_ids)), dtype=np.int8)
+        for step in range(steps):
+            rarity[step], item_type[step] = population.pull_step(counts > step)
+
+        # 按池编号一次抽出所有物品下标
+        pool_ids = pool_id_array(rarity, item_type)
+        item_index = sample_pool_indices(self.banner.pools, pool_ids, self.rng.random(rarity.shape))
+
+        packed = encode_states(population.since_last_five_star, population.since_last_four_star,
+                               population.last_limited_five_star).tolist()
+        for user, state in zip(user_ids, packed):
+            self.store.put(user, state)
+
+        # 转成按用户排列的Python列表，避免逐个取NumPy标量
+        columns = [array.T.tolist() for array in (rarity, item_type, pool_ids, item_index)]
+        offsets = dict.fromkeys(user_ids, 0)
+        column_of = {user: column for column, user in enumerate(user_ids)}
+        for user_id, count, future in requests:
+            column, start = column_of[user_id], offsets[user_id]
+            offsets[user_id] += count
+            if not future.cancelled():
+                rarities, types, pools, indices = (values[column][start:start + count] for values in columns)
+                future.set_result([self._result(*codes) for codes in zip(rarities, types, pools, indices)])
+        self.batches += 1
+
+    def _result(self, rarity: int, type_code: int, pool_id: int, index: int) -> GachaResult:
+        return GachaResult(
+            ItemRarity(rarity),
+            ItemType.LIMITED if type_code == TYPE_LIMITED else ItemType.STANDARD,
+            self._names[pool_id][index]
+        )
@@ -0,0 +1,164 @@
+"""卡池参数扫描：一次评估成千上万组参数
+
+    table = sweep({'base_five_star_prob': [0.005, 0.006, 0.007], 'step_up': range(60, 80)})
+    table[table['expected_pulls'] < 150]
+
+一组参数的所有概率表沿额外的第0维叠在一起，同一块中的参数一起做向量化计算：
+    期望抽数、五星率、限定率     由五星间隔分布直接得到
+    四星率                       以"一个五星周期"为单位的四星计数转移矩阵（四星保底×四星保底），求其稳态
+    抽数分位数                   获得copies个限定所需抽数的分布，批量FFT卷积
+参数块分给进程池并行计算，结果是按参数网格顺序排列的NumPy结构化数组。
+"""
+import csv
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from gacha import DEFAULT_RATES, RATE_FIELDS
+
+_INT_FIELDS = ('step_up', 'step_end', 'four_star_pity')
+DEFAULT_PERCENTILES = (0.1, 0.25, 0.5, 0.75, 0.9, 0.99)
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def design_grid(grid: dict) -> dict:
+    """参数网格的笛卡尔积，返回 {参数名: 数组}；没给出的参数取默认值"""
+    unknown = set(grid) - set(RATE_FIELDS)
+    if unknown:
+        raise ValueError(f"未知的卡池参数: {', '.join(sorted(unknown))}")
+    axes = [list(grid.get(name, [getattr(DEFAULT_RATES, name)])) for name in RATE_FIELDS]
+    columns = zip(*itertools.product(*axes)) if all(axes) else [[] for _ in RATE_FIELDS]
+    params = {name: np.array(column, dtype=np.int64 if name in _INT_FIELDS else float)
+              for name, column in zip(RATE_FIELDS, columns)}
+    if np.any(params['step_up'] > params['step_end']):
+        raise ValueError("step_up不能大于step_end")
+    return params
+
+
+def _rate_tables(params: dict):
+    """与BannerRates相同的概率表，按参数叠成 (设计数, ...) 的数组
+
+    p5[d, l]: 距离上次五星第l+1抽的五星概率，超出该设计step_end的部分补1
+    p4[d, l, c]: 同时四星计数为c（c为抽前计数，最后一格为四星保底）时的四星概率
+    """
+    base5 = params['base_five_star_prob'][:, None]
+    step_up = params['step_up'][:, None]
+    step_end = params['step_end'][:, None]
+    pity = np.arange(1, int(params['step_end'].max()) + 1)[None, :]
+    progress = (pity - step_up) / np.maximum(step_end - step_up, 1)
+    p5 = np.where(pity < step_up, base5, np.where(pity >= step_end, 1.0, base5 + (1 - base5) * progress))
+
+    four_star_pity = int(params['four_star_pity'][0])
+    squeezed = np.clip(np.minimum(1 - p5, params['base_four_star_prob'][:, None]), 0, None)
+    p4 = np.repeat(squeezed[:, :, None], four_star_pity, axis=2)
+    p4[:, :, -1] = 1 - p5  # 四星保底：不是五星就必定是四星
+    return p5, p4
+
+
+def evaluate_designs(params: dict, copies: int = 1, percentiles=DEFAULT_PERCENTILES) -> dict:
+    """对一块参数（four_star_pity必须相同）做向量化评估，返回 {列名: 数组}"""
+    if len(np.unique(params['four_star_pity'])) > 1:
+        raise ValueError("同一块参数的four_star_pity必须相同")
+    p5, p4 = _rate_tables(params)
+    num_designs, length = p5.shape
+    win = params['limited_five_star_prob']
+
+    # 五星间隔分布：hit[d, j]为恰好第j抽出五星的概率
+    survival = np.concatenate((np.ones((num_designs, 1)), np.cumprod(1 - p5, axis=1)[:, :-1]), axis=1)
+    hit = np.zeros((num_designs, length + 1))
+    hit[:, 1:] = p5 * survival
+    mean_gap = survival.sum(axis=1)
+
+    # 一个五星周期内的四星计数转移：state[d, c0, c]为从周期开头四星计数c0出发、到当前仍未出五星且计数为c的概率
+    four_star_pity = p4.shape[2]
+    state = np.broadcast_to(np.eye(four_star_pity), (num_designs, four_star_pity, four_star_pity)).copy()
+    cycle = np.zeros_like(state)  # cycle[d, c0, c1]：下一周期开头计数为c1的概率
+    four_per_cycle = np.zeros((num_designs, four_star_pity))
+    for l in range(length):
+        five = state * p5[:, l, None, None]
+        four = state * p4[:, l, None, :]
+        three = state - five - four
+        # 五星和三星都让四星计数+1（最后一格饱和），四星让计数归零
+        cycle[:, :, 1:] += five[:, :, :-1]
+        cycle[:, :, -1] += five[:, :, -1]
+        four_per_cycle += four.sum(axis=2)
+        state = np.zeros_like(state)
+        state[:, :, 0] = four.sum(axis=2)
+        state[:, :, 1:] += three[:, :, :-1]
+        state[:, :, -1] += three[:, :, -1]
+
+    # 周期开头四星计数的稳态：v = v·cycle，用归一化条件替换一个方程
+    system = np.swapaxes(cycle, 1, 2) - np.eye(four_star_pity)
+    system[:, 0, :] = 1.0
+    rhs = np.zeros((num_designs, four_star_pity))
+    rhs[:, 0] = 1.0
+    start = np.linalg.solve(system, rhs[:, :, None])[:, :, 0]
+
+    five_star_rate = 1 / mean_gap
+    columns = {
+        # 每个限定平均需要(2-win)个五星
+        'expected_pulls': copies * (2 - win) * mean_gap,
+        'five_star_rate': five_star_rate,
+        'four_star_rate': np.einsum('dc,dc->d', start, four_per_cycle) * five_star_rate,
+        'limited_rate': five_star_rate / (2 - win)
+    }
+
+    # 获得copies个限定所需抽数：单个限定 = win·hit + (1-win)·hit*hit，再做copies重卷积
+    size = 2 * copies * length + 1
+    fft_size = 1 << (size - 1).bit_length()
+    spectrum = np.fft.rfft(hit, fft_size, axis=1)
+    one = win[:, None] * spectrum + (1 - win[:, None]) * spectrum ** 2
+    pmf = np.clip(np.fft.irfft(one ** copies, fft_size, axis=1)[:, :size], 0, None)
+    cdf = np.cumsum(pmf, axis=1) / pmf.sum(axis=1, keepdims=True)
+    for q in percentiles:
+        columns[_percentile_name(q)] = (cdf < q - 1e-12).sum(axis=1)
+    return columns
+
+
+def _percentile_name(q: float) -> str:
+    return f"p{q * 100:g}".replace('.', '_')
+
+
+def _evaluate_chunk(args):
+    params, copies, percentiles = args
+    return evaluate_designs(params, copies, percentiles)
+
+
+def sweep(grid: dict, copies: int = 1, percentiles=DEFAULT_PERCENTILES, workers: int = None,
+          chunk_size: int = DEFAULT_CHUNK_SIZE) -> np.ndarray:
+    """评估参数网格中的每一组参数，返回按网格顺序排列的结构化数组（参数列 + 结果列）"""
+    params = design_grid(grid)
+    num_designs = len(params['step_end'])
+    # four_star_pity相同的参数才能叠在一起，稳定排序后再切块
+    order = np.argsort(params['four_star_pity'], kind='stable')
+    chunks = []
+    for value in np.unique(params['four_star_pity']):
+        group = order[params['four_star_pity'][order] == value]
+        chunks += [group[i:i + chunk_size] for i in range(0, len(group), chunk_size)]
+    tasks = [({name: column[chunk] for name, column in params.items()}, copies, percentiles) for chunk in chunks]
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) <= 1:
+        results = [_evaluate_chunk(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_evaluate_chunk, tasks))
+
+    result_names = ['expected_pulls', 'five_star_rate', 'four_star_rate', 'limited_rate']
+    result_names += [_percentile_name(q) for q in percentiles]
+    dtype = [(name, params[name].dtype) for name in RATE_FIELDS]
+    dtype += [(name, np.int64 if name.startswith('p') else float) for name in result_names]
+    table = np.empty(num_designs, dtype=dtype)
+    for name in RATE_FIELDS:
+        table[name] = params[name]
+    for chunk, columns in zip(chunks, results):
+        for name in result_names:
+            table[name][chunk] = columns[name]
+    return table
+
+
+def to_csv(table: np.ndarray, path):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(table.dtype.names)
+        writer.writerows(table.tolist())
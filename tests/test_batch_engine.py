@@ -0,0 +1,100 @@
+"""批量抽卡引擎（GachaSystem.pull_batch）与逐抽模拟、理论分布的一致性
+
+随机数种子固定，结果是确定的；p值下限取1e-3。
+"""
+import numpy as np
+import pytest
+from scipy import stats
+
+from analysis import GachaAnalysis
+from gacha import DEFAULT_RATES, GachaSystem
+
+P_FLOOR = 1e-3
+
+
+def gap_pmf(rates=DEFAULT_RATES) -> np.ndarray:
+    """出金间隔的理论分布：pmf[j]为恰好第j抽出五星的概率"""
+    p5 = rates.five_star_array[1:]
+    survival = np.concatenate(([1.0], np.cumprod(1 - p5)[:-1]))
+    return np.concatenate(([0.0], p5 * survival))
+
+
+def gap_pvalue(gaps: np.ndarray, rates=DEFAULT_RATES) -> float:
+    """出金间隔的卡方拟合优度检验，期望频数过小的格子合并到相邻格"""
+    expected = gap_pmf(rates)[1:] * len(gaps)
+    observed = np.bincount(gaps, minlength=rates.step_end + 1)[1:]
+    merged_obs, merged_exp, obs, exp = [], [], 0, 0.0
+    for o, e in zip(observed, expected):
+        obs, exp = obs + o, exp + e
+        if exp >= 5:
+            merged_obs.append(obs)
+            merged_exp.append(exp)
+            obs, exp = 0, 0.0
+    merged_obs[-1] += obs
+    merged_exp[-1] += exp
+    return stats.chisquare(merged_obs, merged_exp).pvalue
+
+
+def last_position(mask: np.ndarray, initial: int) -> np.ndarray:
+    """每个位置之前（不含）最近一次mask为真的位置，没有时为initial"""
+    positions = np.where(mask, np.arange(len(mask)), initial)
+    before = np.maximum.accumulate(positions)
+    return np.concatenate(([initial], before[:-1]))
+
+
+def test_batch_matches_scalar():
+    result = GachaAnalysis().compare_batch_and_scalar(200_000, seed=1)
+    assert result['结果分布p值'] > P_FLOOR
+    assert result['出金间隔p值'] > P_FLOOR
+
+
+def test_batch_gaps_match_theory():
+    # 500万抽约8万个五星，出金间隔均值偏差0.6%时z≈4
+    batch = GachaSystem(np.random.default_rng(2)).pull_batch(5_000_000)
+    gaps = batch.pity[batch.rarity == 5].astype(np.int64)
+    assert gap_pvalue(gaps) > P_FLOOR
+
+    pmf = gap_pmf()
+    mean = (np.arange(len(pmf)) * pmf).sum()
+    std = np.sqrt((np.arange(len(pmf)) ** 2 * pmf).sum() - mean ** 2)
+    assert abs(gaps.mean() - mean) < 3.5 * std / np.sqrt(len(gaps))
+
+
+@pytest.fixture(scope='module')
+def small_batches():
+    """同一个模拟器连续调用很多次小批量，拼成一条序列"""
+    gacha = GachaSystem(np.random.default_rng(3))
+    sizes = np.random.default_rng(4).integers(1, 40, size=5000)
+    batches = [gacha.pull_batch(int(size)) for size in sizes]
+    columns = {name: np.concatenate([getattr(b, name) for b in batches])
+               for name in ('rarity', 'item_type', 'pity')}
+    return gacha, columns
+
+
+def test_five_star_pity_carries_across_batches(small_batches):
+    gacha, columns = small_batches
+    rarity = columns['rarity']
+    idx = np.arange(len(rarity))
+    # 每抽的pity是整条序列上距离上次五星的抽数，不会在批次边界归零
+    last_five = last_position(rarity == 5, -1)
+    assert np.array_equal(columns['pity'], idx - last_five)
+    assert gacha.since_last_five_star == len(rarity) - 1 - np.flatnonzero(rarity == 5)[-1]
+    assert gap_pvalue(columns['pity'][rarity == 5].astype(np.int64)) > P_FLOOR
+
+
+def test_four_star_pity_carries_across_batches(small_batches):
+    gacha, columns = small_batches
+    rarity = columns['rarity']
+    idx = np.arange(len(rarity))
+    # 距离上次四星满10抽后只能出四星或五星
+    since_four = idx - last_position(rarity == 4, -1)
+    assert since_four[rarity == 3].max() < 10
+    assert gacha.since_last_four_star == len(rarity) - 1 - np.flatnonzero(rarity == 4)[-1]
+
+
+def test_guarantee_carries_across_batches(small_batches):
+    _, columns = small_batches
+    five_types = columns['item_type'][columns['rarity'] == 5]
+    # 歪了（常驻）之后的下一个五星必定是限定
+    assert np.all(five_types[1:][five_types[:-1] == 0] == 1)
+    assert 0 < (five_types == 0).mean() < 0.5
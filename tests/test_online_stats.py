@@ -0,0 +1,55 @@
+"""RateAccumulator：分块统计合并后与一次性统计相同，批数不足时的置信区间"""
+import numpy as np
+import pytest
+
+from gacha import GachaSystem
+from online_stats import BATCH_PULLS, RateAccumulator, wilson_interval
+
+
+@pytest.fixture(scope='module')
+def batch():
+    return GachaSystem(np.random.default_rng(5)).pull_batch(1_000_000)
+
+
+def accumulate(batch, start, stop):
+    return RateAccumulator().update(batch.rarity[start:stop], batch.item_type[start:stop], batch.pity[start:stop])
+
+
+def test_merge_equals_single_pass(batch):
+    single = RateAccumulator().update_batch(batch)
+    # 切点取批的整数倍，两边的批均值与一次性统计的划分相同
+    split = 100 * BATCH_PULLS
+    merged = accumulate(batch, 0, split).merge(accumulate(batch, split, len(batch.rarity)))
+    assert merged.results() == single.results()
+    assert np.array_equal(merged.gap_hist, single.gap_hist)
+    assert merged.gap_mean == pytest.approx(single.gap_mean, rel=1e-12)
+    assert merged.gap_variance == pytest.approx(single.gap_variance, rel=1e-12)
+    assert merged.batch_count == single.batch_count
+    assert np.array_equal(merged.batch_sum, single.batch_sum)
+    assert np.array_equal(merged.batch_sumsq, single.batch_sumsq)
+
+
+def test_merge_at_arbitrary_split(batch):
+    single = RateAccumulator().update_batch(batch)
+    merged = accumulate(batch, 0, 123_457).merge(accumulate(batch, 123_457, len(batch.rarity)))
+    # 计数与间隔统计和切点无关；两边末尾不满一批的部分不计入批均值
+    assert merged.results() == single.results()
+    assert np.array_equal(merged.gap_hist, single.gap_hist)
+    assert merged.gap_mean == pytest.approx(single.gap_mean, rel=1e-12)
+    assert merged.gap_variance == pytest.approx(single.gap_variance, rel=1e-12)
+    assert merged.batch_count == single.batch_count - 1
+
+
+def test_batch_interval_falls_back_to_wilson(batch):
+    accumulator = accumulate(batch, 0, 2 * BATCH_PULLS - 1)
+    assert accumulator.batch_count == 1
+    intervals = accumulator.confidence_intervals()
+    n = accumulator.total_pulls
+    assert intervals['four_star_rate'] == wilson_interval(accumulator.four_star_count, n)
+    assert intervals['limited_rate'] == wilson_interval(accumulator.limited_five_star_count, n)
+
+    last = slice(2 * BATCH_PULLS - 1, 2 * BATCH_PULLS)
+    accumulator.update(batch.rarity[last], batch.item_type[last], batch.pity[last])
+    assert accumulator.batch_count == 2
+    assert accumulator.confidence_intervals()['four_star_rate'] != \
+        wilson_interval(accumulator.four_star_count, accumulator.total_pulls)
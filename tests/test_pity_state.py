@@ -0,0 +1,66 @@
+"""保底状态的2字节打包格式：往返、四星计数饱和、超出范围时抛ValueError"""
+import numpy as np
+import pytest
+
+from gacha import (DEFAULT_RATES, INITIAL_STATE, BannerRates, PityState, check_packable,
+                   decode_states, encode_states)
+
+
+@pytest.mark.parametrize('state', [PityState(), PityState(0, 0, 0), PityState(89, 9, 0),
+                                   PityState(127, 15, 1), PityState(42, 3, 1)])
+def test_pack_round_trip(state):
+    packed = state.pack()
+    assert 0 <= packed < 1 << 16
+    restored = PityState.unpack(packed)
+    assert (restored.since_last_five_star, restored.since_last_four_star, restored.last_limited_five_star) == \
+        (state.since_last_five_star, state.since_last_four_star, state.last_limited_five_star)
+    assert PityState.from_bytes(state.to_bytes()) == state
+    assert len(state.to_bytes()) == 2
+
+
+def test_four_star_counter_saturates():
+    for since_four in (15, 16, 40, 1000):
+        state = PityState.unpack(PityState(5, since_four, 1).pack())
+        assert state.since_last_four_star == 15
+        assert state.since_last_five_star == 5
+
+
+def test_initial_state():
+    assert PityState.unpack(INITIAL_STATE) == PityState(0, 0, 1)
+
+
+def test_encode_decode_round_trip():
+    rng = np.random.default_rng(6)
+    five = rng.integers(0, 128, size=10_000)
+    four = rng.integers(0, 40, size=10_000)
+    limited = rng.integers(0, 2, size=10_000).astype(bool)
+    packed = encode_states(five, four, limited)
+    assert packed.dtype == np.uint16
+    decoded_five, decoded_four, decoded_limited = decode_states(packed)
+    assert np.array_equal(decoded_five, five)
+    assert np.array_equal(decoded_four, np.minimum(four, 15))
+    assert np.array_equal(decoded_limited, limited)
+    # 与逐个打包的结果相同
+    assert [int(p) for p in packed[:100]] == \
+        [PityState(int(a), int(b), int(c)).pack() for a, b, c in zip(five[:100], four[:100], limited[:100])]
+
+
+@pytest.mark.parametrize('state', [PityState(128, 0, 1), PityState(-1, 0, 1), PityState(0, -1, 1)])
+def test_pack_out_of_range(state):
+    with pytest.raises(ValueError):
+        state.pack()
+
+
+@pytest.mark.parametrize('five, four', [([128], [0]), ([-1], [0]), ([0], [-1])])
+def test_encode_out_of_range(five, four):
+    with pytest.raises(ValueError):
+        encode_states(five, four, [1])
+
+
+def test_check_packable():
+    check_packable(DEFAULT_RATES)
+    check_packable(BannerRates(step_up=100, step_end=128, four_star_pity=15))
+    with pytest.raises(ValueError):
+        check_packable(BannerRates(step_up=150, step_end=200))
+    with pytest.raises(ValueError):
+        check_packable(BannerRates(four_star_pity=16))
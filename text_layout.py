@@ -0,0 +1,81 @@
+"""终端文本排版：显示宽度、截断、结果方框的几何位置
+
+显示宽度按Unicode东亚宽度规则计算：W/F（中日韩文字、大部分emoji）占2列，
+组合字符、零宽字符和控制字符占0列，其余（包括★这类宽度不确定的A类字符）占1列。
+物品名称是固定的一小组，宽度和截断结果按字符串缓存；方框位置按终端大小缓存。
+"""
+import unicodedata
+from functools import lru_cache
+from typing import NamedTuple
+
+BOX_WIDTH = 18  # 增加宽度到18，确保有足够空间
+BOX_HEIGHT = 5
+BOXES_PER_ROW = 5
+MAX_BOXES = 10  # 十连
+
+
+@lru_cache(maxsize=4096)
+def char_width(char: str) -> int:
+    if unicodedata.combining(char) or unicodedata.category(char) in ('Mn', 'Me', 'Cf', 'Cc'):
+        return 0
+    return 2 if unicodedata.east_asian_width(char) in ('W', 'F') else 1
+
+
+@lru_cache(maxsize=4096)
+def display_width(text: str) -> int:
+    return sum(map(char_width, text))
+
+
+@lru_cache(maxsize=4096)
+def truncate(text: str, max_width: int) -> str:
+    """不超过max_width列的最长前缀（一次扫描）"""
+    width = 0
+    for i, char in enumerate(text):
+        width += char_width(char)
+        if width > max_width:
+            return text[:i]
+    return text
+
+
+def centered(text: str, space_width: int) -> int:
+    """文字居中的起始列"""
+    return (space_width - display_width(text)) // 2
+
+
+class BoxText(NamedTuple):
+    """方框内两行文字及其在方框内的起始列"""
+    name: str
+    name_x: int
+    rarity: str
+    rarity_x: int
+
+
+@lru_cache(maxsize=None)
+def box_text(item_name: str, stars: int, box_width: int = BOX_WIDTH) -> BoxText:
+    # 两边各留2个字符的空间；确保文字不会覆盖边框
+    name = truncate(item_name, box_width - 4)
+    rarity = "★" * stars
+    return BoxText(name, max(centered(name, box_width), 1), rarity, max(centered(rarity, box_width), 1))
+
+
+class ScreenLayout(NamedTuple):
+    """一种终端大小下各元素的位置"""
+    height: int
+    width: int
+    boxes: tuple  # 每个结果方框左上角的 (y, x)；放不下的为None
+    stats_lines: int
+
+
+@lru_cache(maxsize=16)
+def screen_layout(height: int, width: int, stats_lines: int) -> ScreenLayout:
+    start_x = (width - BOX_WIDTH * BOXES_PER_ROW) // 2
+    total_rows = (MAX_BOXES + BOXES_PER_ROW - 1) // BOXES_PER_ROW
+    start_y = 2 + (height - 10 - total_rows * BOX_HEIGHT) // 2
+    bottom = height - stats_lines - 1  # 方框不能进入统计区
+    boxes = []
+    for position in range(MAX_BOXES):
+        y = start_y + position // BOXES_PER_ROW * BOX_HEIGHT
+        x = start_x + position % BOXES_PER_ROW * BOX_WIDTH
+        fits = y >= 1 and x >= 1 and y + BOX_HEIGHT <= bottom and x + BOX_WIDTH <= width - 1
+        boxes.append((y, x) if fits else None)
+    return ScreenLayout(height, width, tuple(boxes), stats_lines)
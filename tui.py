@@ -1,14 +1,91 @@
 import curses
 import time
-from gacha import GachaSystem, ItemRarity, ItemType
+from gacha import BatchResult, GachaSystem, ItemRarity, ItemType, pool_id_array
+from text_layout import BOX_HEIGHT, BOX_WIDTH, box_text, centered, screen_layout, truncate
+
+STATS_LINES = 7  # 底部为统计信息预留的行数
+ANIMATION_FRAMES = ("★", "★ ★", "★ ★ ★")
+FRAME_INTERVAL = 0.1  # 动画每帧的时长（秒）
+BULK_PULLS = 1000  # 批量抽卡键一次的抽数
+
+# 统计信息的分类及显示顺序
+CATEGORIES = (
+    ((ItemRarity.FIVE_STAR, ItemType.LIMITED), "限定五星："),
+    ((ItemRarity.FIVE_STAR, ItemType.STANDARD), "常驻五星："),
+    ((ItemRarity.FOUR_STAR, ItemType.LIMITED), "限定四星："),
+    ((ItemRarity.FOUR_STAR, ItemType.STANDARD), "常驻四星："),
+)
+
+def get_constellation_text(count):
+    if count <= 6:
+        return f"{count-1}命" if count > 1 else "0命"
+    elif count == 7:
+        return "满命"
+    else:
+        return f"满命溢出{count-7}只"
+
+class CollectionStats:
+    """按分类增量维护的角色计数
+
+    每个分类保存 名称 -> 次数 和 名称 -> 渲染好的"名称(命座)"，按首次获得的顺序排列。
+    计数变化时只重新渲染变化的条目，并把所在分类的行标脏；lines()只重新拼接脏的行。
+    """
+
+    def __init__(self):
+        self.counts = {key: {} for key, _ in CATEGORIES}
+        self.entries = {key: {} for key, _ in CATEGORIES}
+        self.rendered_lines = {key: None for key, _ in CATEGORIES}
+
+    def add(self, name: str, rarity: ItemRarity, item_type: ItemType, n: int = 1):
+        key = (rarity, item_type)
+        counts = self.counts.get(key)
+        if counts is None:  # 三星不统计
+            return
+        count = counts[name] = counts.get(name, 0) + n
+        self.entries[key][name] = f"{name}({get_constellation_text(count)})"
+        self.rendered_lines[key] = None
+
+    def add_batch(self, batch, pools):
+        """合并一批pull_batch的结果：每个物品只更新一次"""
+        import numpy as np
+        pool_ids = pool_id_array(batch.rarity, batch.item_type)
+        for (rarity, item_type), _ in CATEGORIES:
+            pool_id = (3 if rarity == ItemRarity.FIVE_STAR else 1) + (item_type == ItemType.LIMITED)
+            indices = batch.item_index[pool_ids == pool_id]
+            unique, first, counts = np.unique(indices, return_index=True, return_counts=True)
+            # 按批内首次出现的顺序加入，与逐抽添加的顺序一致
+            for i in np.argsort(first, kind='stable').tolist():
+                self.add(pools[pool_id].names[unique[i]], rarity, item_type, int(counts[i]))
+
+    def lines(self) -> list:
+        lines = []
+        for key, label in CATEGORIES:
+            if not self.entries[key]:
+                continue
+            if self.rendered_lines[key] is None:
+                self.rendered_lines[key] = label + ", ".join(self.entries[key].values())
+            lines.append(self.rendered_lines[key])
+        return lines
 
 class GachaTUI:
+    """抽卡界面
+
+    屏幕分为三层：边框/标题/帮助（只在初始化和改变终端大小时重画）、结果区、统计区。
+    每次状态变化只把对应区域标脏，render()只重画脏区域，最后一次doupdate()输出。
+    抽卡动画由getch的超时驱动，不阻塞按键；动画中按任意键直接显示结果。
+    """
+
     def __init__(self, stdscr):
         self.stdscr = stdscr
         self.gacha = GachaSystem()
-        self.character_counts = {}  # 存储角色抽取次数
+        self.stats = CollectionStats()  # 角色抽取次数，增量更新
         self.total_pulls = 0  # 添加总抽数统计
+        self.results = []  # 结果区当前显示的结果
+        self.animation = None  # 进行中的动画：(开始时间, 动画结束后显示的结果)
+        self.box_cache = {}  # 预先画好的结果方框（pad），按结果缓存
+        self.dirty = set()
         self.setup_screen()
+        self.layout()
 
     def setup_screen(self):
         curses.start_color()
@@ -22,20 +99,14 @@ class GachaTUI:
         curses.curs_set(0)
         self.stdscr.clear()
 
-    def draw_box(self, y, x, width, height):
-        # 绘制方框
-        self.stdscr.addch(y, x, '┌')
-        self.stdscr.addch(y, x + width - 1, '┐')
-        self.stdscr.addch(y + height - 1, x, '└')
-        self.stdscr.addch(y + height - 1, x + width - 1, '┘')
-        
-        for i in range(1, width - 1):
-            self.stdscr.addch(y, x + i, '─')
-            self.stdscr.addch(y + height - 1, x + i, '─')
-        
-        for i in range(1, height - 1):
-            self.stdscr.addch(y + i, x, '│')
-            self.stdscr.addch(y + i, x + width - 1, '│')
+    def layout(self):
+        """按终端大小重新划分结果区和统计区，全部标脏"""
+        max_y, max_x = self.stdscr.getmaxyx()
+        self.screen = screen_layout(max_y, max_x, STATS_LINES)
+        self.stdscr.erase()
+        self.result_win = self.stdscr.derwin(max(max_y - STATS_LINES - 2, 1), max(max_x - 2, 1), 1, 1)
+        self.stats_win = self.stdscr.derwin(STATS_LINES, max(max_x - 2, 1), max(max_y - 1 - STATS_LINES, 1), 1)
+        self.dirty = {'frame', 'results', 'stats'}
 
     def get_color_pair(self, result):
         if result.rarity == ItemRarity.FIVE_STAR:
@@ -44,183 +115,141 @@ class GachaTUI:
             return 3 if result.item_type == ItemType.LIMITED else 4
         return 5
 
-    def show_pull_animation(self):
-        max_y, max_x = self.stdscr.getmaxyx()
-        center_y, center_x = max_y // 2, max_x // 2
-        
-        animations = ["★", "★ ★", "★ ★ ★"]
-        for frame in animations:
-            self.stdscr.addstr(center_y, center_x - len(frame)//2, frame)
-            self.stdscr.refresh()
-            time.sleep(0.1)  # 加快动画速度
-            self.stdscr.clear()
-            self.draw_frame()
+    def result_box(self, result):
+        """结果方框只画一次，之后复用同一个pad"""
+        key = (result.item_name, result.rarity, result.item_type)
+        pad = self.box_cache.get(key)
+        if pad is not None:
+            return pad
 
-    def get_string_display_width(self, s: str) -> int:
-        """计算字符串显示宽度，中文字符计2，ASCII字符计1"""
-        width = 0
-        for char in s:
-            width += 2 if ord(char) > 255 else 1
-        return width
+        pad = curses.newpad(BOX_HEIGHT, BOX_WIDTH)
+        pad.box()
+        attr = curses.color_pair(self.get_color_pair(result)) | curses.A_BOLD
+        text = box_text(result.item_name, result.rarity.value)
+        pad.addstr(1, text.name_x, text.name, attr)
+        pad.addstr(2, text.rarity_x, text.rarity, attr)
+        self.box_cache[key] = pad
+        return pad
 
-    def get_centered_position(self, text: str, space_width: int) -> int:
-        """计算文字居中的起始位置"""
-        text_width = self.get_string_display_width(text)
-        return (space_width - text_width) // 2
+    def draw_results(self):
+        self.result_win.erase()
+        if self.animation is not None:
+            frame = ANIMATION_FRAMES[self.animation_frame()]
+            height, width = self.result_win.getmaxyx()
+            self.result_win.addstr(height // 2, max(centered(frame, width), 0), truncate(frame, width - 1))
+            self.result_win.noutrefresh()
+            return
 
-    def display_result(self, result, position=None):
-        max_y, max_x = self.stdscr.getmaxyx()
-        box_width = 18  # 增加宽度到18，确保有足够空间
-        box_height = 5
-        
-        # 计算起始位置
-        start_x = (max_x - box_width * 5) // 2
-        usable_height = max_y - 10
-        total_rows = (10 + 4) // 5
-        total_height = total_rows * box_height
-        start_y = 2 + (usable_height - total_height) // 2
-        
-        row = position // 5 if position is not None else 0
-        col = position % 5 if position is not None else 0
-        
-        x = start_x + col * box_width
-        y = start_y + row * box_height
-        
-        # 绘制方框
-        self.draw_box(y, x, box_width, box_height)
-        
-        # 获取颜色
-        color = self.get_color_pair(result)
-        
-        # 显示结果（确保内容不会覆盖边框）
-        self.stdscr.attron(curses.color_pair(color) | curses.A_BOLD)
-        
-        # 处理名称文本，留出更多边距
-        name_text = result.item_name
-        max_width = box_width - 4  # 两边各留2个字符的空间
-        while self.get_string_display_width(name_text) > max_width:
-            name_text = name_text[:-1]
-        
-        name_x = x + self.get_centered_position(name_text, box_width)
-        rarity_text = "★" * result.rarity.value
-        rarity_x = x + self.get_centered_position(rarity_text, box_width)
-        
-        # 确保文字不会覆盖边框
-        if name_x < x + 1:
-            name_x = x + 1
-        if rarity_x < x + 1:
-            rarity_x = x + 1
-            
-        self.stdscr.addstr(y + 1, name_x, name_text)
-        self.stdscr.addstr(y + 2, rarity_x, rarity_text)
-        self.stdscr.attroff(curses.color_pair(color) | curses.A_BOLD)
-        
-        # 刷新屏幕
-        self.stdscr.refresh()
-
-    def get_constellation_text(self, count):
-        if count <= 6:
-            return f"{count-1}命" if count > 1 else "0命"
-        elif count == 7:
-            return "满命"
-        else:
-            return f"满命溢出{count-7}只"
+        self.result_win.noutrefresh()
+        for result, position in zip(self.results, self.screen.boxes):
+            # 终端太小放不下的方框不画
+            if position is not None:
+                y, x = position
+                self.result_box(result).noutrefresh(0, 0, y, x, y + BOX_HEIGHT - 1, x + BOX_WIDTH - 1)
 
     def update_character_count(self, result):
-        if result.rarity in [ItemRarity.FOUR_STAR, ItemRarity.FIVE_STAR]:
-            key = (result.item_name, result.rarity, result.item_type)
-            self.character_counts[key] = self.character_counts.get(key, 0) + 1
+        self.stats.add(result.item_name, result.rarity, result.item_type)
 
     def get_statistics_text(self):
-        limited_5 = {}
-        standard_5 = {}
-        limited_4 = {}
-        standard_4 = {}
-
-        for (name, rarity, item_type), count in self.character_counts.items():
-            if rarity == ItemRarity.FIVE_STAR:
-                if item_type == ItemType.LIMITED:
-                    limited_5[name] = count
-                else:
-                    standard_5[name] = count
-            elif rarity == ItemRarity.FOUR_STAR:
-                if item_type == ItemType.LIMITED:
-                    limited_4[name] = count
-                else:
-                    standard_4[name] = count
-
-        lines = []
-        if limited_5:
-            lines.append("限定五星：" + ", ".join(f"{name}({self.get_constellation_text(count)})" 
-                        for name, count in limited_5.items()))
-        if standard_5:
-            lines.append("常驻五星：" + ", ".join(f"{name}({self.get_constellation_text(count)})" 
-                        for name, count in standard_5.items()))
-        if limited_4:
-            lines.append("限定四星：" + ", ".join(f"{name}({self.get_constellation_text(count)})" 
-                        for name, count in limited_4.items()))
-        if standard_4:
-            lines.append("常驻四星：" + ", ".join(f"{name}({self.get_constellation_text(count)})" 
-                        for name, count in standard_4.items()))
-        
-        lines.append(f"总抽数：{self.total_pulls}")  # 使用 self.total_pulls
-        return lines
-
-    def clear_stats_area(self):
-        """清除统计信息区域"""
-        max_y, max_x = self.stdscr.getmaxyx()
-        # 清除从底部往上7行的区域（为统计信息预留更多空间）
-        for i in range(2, 9):  # 增加清除的行数
-            self.stdscr.move(max_y-i, 1)
-            self.stdscr.clrtoeol()
+        return self.stats.lines() + [f"总抽数：{self.total_pulls}"]
 
     def draw_frame(self):
         max_y, max_x = self.stdscr.getmaxyx()
-        
+
         # 1. 绘制基础框架
         self.stdscr.box()
-        
+
         # 2. 显示标题
-        title = "★ 豪华抽卡模拟器 ★"
-        self.stdscr.addstr(0, (max_x - len(title)) // 2, title)
-        
-        # 3. 清除并显示统计信息（只清除统计信息区域）
-        self.clear_stats_area()
+        title = truncate("★ 豪华抽卡模拟器 ★", max_x - 2)
+        self.stdscr.addstr(0, max(centered(title, max_x), 1), title)
+
+        # 3. 显示底部帮助信息
+        help_text = truncate(f"按'1'单抽 | 按'0'十连 | 按'b'{BULK_PULLS}连 | 按'q'退出", max_x - 2)
+        self.stdscr.addstr(max_y-1, max(centered(help_text, max_x), 1), help_text)
+        self.stdscr.noutrefresh()
+
+    def draw_stats(self):
+        self.stats_win.erase()
+        height, width = self.stats_win.getmaxyx()
         stats = self.get_statistics_text()
-        for i, line in enumerate(reversed(stats)):  # 从下往上显示
-            if max_y-(i+2) > 1:  # 确保不会覆盖到标题
-                self.stdscr.addstr(max_y-(i+2), 2, line[:max_x-4])
-        
-        # 4. 显示底部帮助信息
-        help_text = "按'1'单抽 | 按'0'十连 | 按'q'退出"
-        self.stdscr.addstr(max_y-1, (max_x - len(help_text)) // 2, help_text)
-        
-        self.stdscr.refresh()
+        for i, line in enumerate(reversed(stats[-height:])):  # 从下往上显示
+            self.stats_win.addstr(height - 1 - i, 1, truncate(line, width - 2))
+        self.stats_win.noutrefresh()
+
+    def render(self):
+        """只重画标脏的区域"""
+        if not self.dirty:
+            return
+        if 'frame' in self.dirty:
+            self.draw_frame()
+        if 'results' in self.dirty:
+            self.draw_results()
+        if 'stats' in self.dirty:
+            self.draw_stats()
+        self.dirty.clear()
+        curses.doupdate()
+
+    def animation_frame(self) -> int:
+        return min(int((time.monotonic() - self.animation[0]) / FRAME_INTERVAL), len(ANIMATION_FRAMES) - 1)
+
+    def start_pull(self, times: int):
+        self.animation = (time.monotonic(), self.gacha.pull_multi(times))
+        self.dirty.add('results')
+
+    def bulk_pull(self, times: int):
+        """走批量引擎一次抽完，统计只更新一次，结果区显示最后十抽，不播放动画"""
+        batch = self.gacha.pull_batch(times)
+        self.total_pulls += times
+        self.stats.add_batch(batch, self.gacha.pools)
+        last = BatchResult(batch.rarity[-10:], batch.item_type[-10:], batch.item_index[-10:], batch.pity[-10:])
+        self.results = last.to_results(self.gacha.items)
+        self.dirty.update(('results', 'stats'))
+
+    def finish_animation(self):
+        """动画结束（或被跳过）后才显示结果并计入统计，动画期间不剧透"""
+        self.results = self.animation[1]
+        self.animation = None
+        self.total_pulls += len(self.results)
+        for result in self.results:
+            self.update_character_count(result)
+        self.dirty.update(('results', 'stats'))
+
+    def tick(self):
+        """getch超时：推进动画，播完后显示结果"""
+        if time.monotonic() - self.animation[0] >= FRAME_INTERVAL * len(ANIMATION_FRAMES):
+            self.finish_animation()
+        else:
+            self.dirty.add('results')
 
     def run(self):
         while True:
-            self.draw_frame()
+            self.render()
+            if self.animation is None:
+                self.stdscr.timeout(-1)
+            else:
+                # 等到下一帧为止；期间有按键立即返回
+                elapsed = time.monotonic() - self.animation[0]
+                self.stdscr.timeout(max(int(((self.animation_frame() + 1) * FRAME_INTERVAL - elapsed) * 1000), 1))
             key = self.stdscr.getch()
-            
+
+            if key == -1:
+                if self.animation is not None:
+                    self.tick()
+                continue
+            if self.animation is not None:
+                # 动画中按任意键跳过动画
+                self.finish_animation()
+
             if key == ord('q'):
                 break
+            elif key == curses.KEY_RESIZE:
+                self.layout()
             elif key == ord('1'):
-                self.show_pull_animation()
-                result = self.gacha.pull()
-                self.total_pulls += 1
-                self.update_character_count(result)
-                self.stdscr.clear()
-                self.draw_frame()
-                self.display_result(result)
+                self.start_pull(1)
             elif key == ord('0'):
-                self.show_pull_animation()
-                results = self.gacha.pull_multi(10)
-                self.total_pulls += 10
-                self.stdscr.clear()
-                self.draw_frame()
-                for i, result in enumerate(results):
-                    self.update_character_count(result)
-                    self.display_result(result, i)
+                self.start_pull(10)
+            elif key == ord('b'):
+                self.bulk_pull(BULK_PULLS)
 
 def main(stdscr):
     app = GachaTUI(stdscr)